@@ -0,0 +1,55 @@
+import threading
+
+
+class AdmissionController:
+    """
+    Caps how many expensive callbacks a process runs at once.
+
+    Callbacks are either "submit" (storing an answer) or "render" (showing
+    a case). Both share `max_inflight` slots, but renders may only use
+    `max_renders` of them, so the rest are always free for submits. A
+    render that finds no free slot is turned away at once (the browser
+    retries it later); a submit waits up to `submit_wait` seconds for a
+    slot before it is turned away.
+    """
+
+    def __init__(self, max_inflight, max_renders, submit_wait=5.0):
+        self.max_inflight = max_inflight
+        self.max_renders = min(max_renders, max_inflight)
+        self.submit_wait = submit_wait
+        self._inflight = {"submit": 0, "render": 0}
+        self._cond = threading.Condition()
+        self.admitted = {"submit": 0, "render": 0}
+        self.rejected = {"submit": 0, "render": 0}
+
+    def _total(self):
+        return self._inflight["submit"] + self._inflight["render"]
+
+    def _has_slot(self, kind):
+        if self._total() >= self.max_inflight:
+            return False
+        return kind != "render" or self._inflight["render"] < self.max_renders
+
+    def acquire(self, kind):
+        """True if the callback may run now; call release(kind) when it is done."""
+        with self._cond:
+            timeout = self.submit_wait if kind == "submit" else 0
+            if not self._cond.wait_for(lambda: self._has_slot(kind), timeout=timeout):
+                self.rejected[kind] += 1
+                return False
+            self._inflight[kind] += 1
+            self.admitted[kind] += 1
+            return True
+
+    def release(self, kind):
+        with self._cond:
+            self._inflight[kind] -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "inflight": dict(self._inflight),
+                "admitted": dict(self.admitted),
+                "rejected": dict(self.rejected),
+            }
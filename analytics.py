@@ -0,0 +1,226 @@
+"""
+Scoring of all reader submissions against the case table.
+
+    python analytics.py                               # output/*_testing.csv -> output/analytics/
+    python analytics.py --storage sqlite --db output/responses.db
+    python analytics.py --format csv --dest results/
+    python analytics.py --storage compacted           # from compaction.py's dataset
+
+Loads every response in one pass, keeps the last submission of each
+reader and case, joins it to testing_cases.csv and writes
+
+  readers            per reader: cases read, pathology accuracy, BI-RADS
+                     agreement and mean absolute BI-RADS difference, mean
+                     confidence, Brier score and calibration gap
+  cases              the same per case, plus the most common answers
+  calibration        accuracy per 10% confidence bin
+  confusion_pathology, confusion_birads
+                     cohort confusion matrices (rows: truth, columns: answer)
+  reader_confusion   per-reader confusion counts in long format
+
+as Parquet when pyarrow is installed (CSV otherwise, or with --format csv).
+"""
+import glob
+import io
+import os
+import sqlite3
+
+import pandas as pd
+
+from case_index import CSV_COLUMNS
+from storage import RESULT_HEADER, RESULTS_SUFFIX
+
+PATHOLOGIES = ["Benign", "Atypia", "DCIS", "Invasive"]
+# 0-9%, 10-19%, ..., 90-100%
+CONFIDENCE_BINS = list(range(0, 100, 10)) + [101]
+CONFIDENCE_LABELS = [f"{lo}-{lo + 9}%" for lo in range(0, 90, 10)] + ["90-100%"]
+
+
+# -----------------------------
+# Loading
+# -----------------------------
+def load_cases(path="testing_cases.csv"):
+    return pd.read_csv(path).rename(columns=CSV_COLUMNS)
+
+
+def parse_result_rows(chunks):
+    """Result CSV rows (bytes, without header) of several files, parsed as one CSV."""
+    if not any(chunks):
+        return pd.DataFrame(columns=RESULT_HEADER, dtype=str)
+    return pd.read_csv(io.BytesIO(b"".join(chunks)), names=RESULT_HEADER, header=None,
+                       dtype=str, on_bad_lines="skip")
+
+
+def load_csv_responses(output_dir):
+    """All output/<user>_testing.csv rows, parsed as one CSV."""
+    chunks = []
+    for filename in sorted(glob.glob(os.path.join(output_dir, f"*{RESULTS_SUFFIX}"))):
+        with open(filename, "rb") as f:
+            data = f.read()
+        if data.startswith(b"userID,"):
+            data = data[data.find(b"\n") + 1:]
+        if data and not data.endswith(b"\n"):
+            data = data[:data.rfind(b"\n") + 1]    # row still being written
+        chunks.append(data)
+    return parse_result_rows(chunks)
+
+
+def load_sqlite_responses(path):
+    with sqlite3.connect(path) as conn:
+        # same columns as the CSV files (the table calls the reader user_id)
+        columns = ", ".join("user_id AS userID" if c == "userID" else c for c in RESULT_HEADER)
+        return pd.read_sql_query(f"SELECT {columns} FROM responses ORDER BY rowid", conn, dtype=str)
+
+
+def last_answers(responses):
+    """The last submission (by timestamp) of each reader to each case."""
+    return responses.sort_values("timestamp", kind="stable").drop_duplicates(["userID", "case_id"], keep="last")
+
+
+def prepare_responses(responses, cases):
+    """
+    Typed responses joined to their case: the last submission of each
+    (reader, case) is kept and rows of unknown cases are dropped.
+    """
+    df = responses.copy()
+    df["case_id"] = pd.to_numeric(df["case_id"], errors="coerce")
+    df = df.dropna(subset=["userID", "case_id"])
+    df["case_id"] = df["case_id"].astype(int)
+    df = last_answers(df)
+
+    df["pathology"] = df["pathology"].str.strip()
+    df["birads"] = pd.to_numeric(df["birads"].str.extract(r"(\d+)", expand=False), errors="coerce")
+    df["confidence"] = pd.to_numeric(df["confidence"].str.rstrip("%"), errors="coerce")
+
+    df = df.merge(cases[["case_id", "correct_pathology", "correct_BIRADS"]], on="case_id", how="inner")
+    df["pathology_correct"] = (df["pathology"].str.lower()
+                               == df["correct_pathology"].astype(str).str.strip().str.lower())
+    df["birads_agree"] = df["birads"] == df["correct_BIRADS"]
+    df["birads_abs_diff"] = (df["birads"] - df["correct_BIRADS"]).abs()
+    # squared error of the stated confidence as the probability of a correct pathology
+    df["brier"] = (df["confidence"] / 100 - df["pathology_correct"]) ** 2
+    return df
+
+
+# -----------------------------
+# Scoring
+# -----------------------------
+def summarize(df, by):
+    grouped = df.groupby(by)
+    summary = pd.DataFrame({
+        "n": grouped.size(),
+        "pathology_accuracy": grouped["pathology_correct"].mean(),
+        "birads_agreement": grouped["birads_agree"].mean(),
+        "birads_mean_abs_diff": grouped["birads_abs_diff"].mean(),
+        "mean_confidence": grouped["confidence"].mean(),
+        "brier": grouped["brier"].mean(),
+    })
+    # positive: more confident than accurate
+    summary["calibration_gap"] = summary["mean_confidence"] / 100 - summary["pathology_accuracy"]
+    return summary
+
+
+def most_common(df, by, column):
+    counts = df.groupby([by, column]).size().rename("count").reset_index()
+    top = counts.sort_values([by, "count"], ascending=[True, False]).drop_duplicates(by)
+    return top.set_index(by)[column]
+
+
+def score(df):
+    """All result tables of prepared responses, by name."""
+    readers = summarize(df, "userID")
+    cases = summarize(df, "case_id")
+    cases["most_common_pathology"] = most_common(df, "case_id", "pathology")
+    cases["most_common_birads"] = most_common(df, "case_id", "birads")
+
+    bins = pd.cut(df["confidence"], CONFIDENCE_BINS, labels=CONFIDENCE_LABELS, right=False)
+    grouped = df.groupby(bins, observed=False)
+    calibration = pd.DataFrame({
+        "n": grouped.size(),
+        "mean_confidence": grouped["confidence"].mean(),
+        "pathology_accuracy": grouped["pathology_correct"].mean(),
+    })
+    calibration.index = calibration.index.astype(str)
+    calibration.index.name = "confidence_bin"
+
+    confusion_pathology = pd.crosstab(df["correct_pathology"], df["pathology"]).reindex(
+        index=PATHOLOGIES, columns=PATHOLOGIES, fill_value=0)
+    confusion_birads = pd.crosstab(df["correct_BIRADS"], df["birads"])
+    reader_confusion = df.groupby(["userID", "correct_pathology", "pathology"]).size().to_frame("count")
+    return {
+        "readers": readers,
+        "cases": cases,
+        "calibration": calibration,
+        "confusion_pathology": confusion_pathology,
+        "confusion_birads": confusion_birads,
+        "reader_confusion": reader_confusion,
+    }
+
+
+# -----------------------------
+# Output
+# -----------------------------
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def write_tables(tables, dest, fmt="auto"):
+    if fmt == "auto":
+        fmt = "parquet" if parquet_available() else "csv"
+    os.makedirs(dest, exist_ok=True)
+    paths = []
+    for name, table in tables.items():
+        table = table.copy()
+        # parquet needs string column names (confusion matrices have int ones)
+        table.columns = table.columns.astype(str)
+        path = os.path.join(dest, f"{name}.{fmt}")
+        if fmt == "parquet":
+            table.to_parquet(path)
+        else:
+            table.to_csv(path)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Score all submissions against the case table.")
+    parser.add_argument("--storage", choices=("csv", "sqlite", "compacted"),
+                        default=os.environ.get("STORAGE_BACKEND", "csv"))
+    parser.add_argument("--output-dir", default="output", help="where the <user>_testing.csv files are")
+    parser.add_argument("--db", default=os.environ.get("SQLITE_PATH", os.path.join("output", "responses.db")))
+    parser.add_argument("--compacted", default=os.path.join("output", "compacted"),
+                        help="dataset written by compaction.py")
+    parser.add_argument("--study", default="testing", help="study to score from the compacted dataset")
+    parser.add_argument("--cases", default="testing_cases.csv")
+    parser.add_argument("--dest", default=os.path.join("output", "analytics"))
+    parser.add_argument("--format", choices=("auto", "csv", "parquet"), default="auto")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.storage == "sqlite":
+        raw = load_sqlite_responses(args.db)
+    elif args.storage == "compacted":
+        from compaction import load_latest
+        raw = load_latest(args.compacted, args.study)
+    else:
+        raw = load_csv_responses(args.output_dir)
+    responses = prepare_responses(raw, load_cases(args.cases))
+    tables = score(responses)
+    paths = write_tables(tables, args.dest, args.format)
+
+    readers = tables["readers"]
+    print(f"{len(raw)} rows, {len(responses)} scored responses from {len(readers)} readers "
+          f"in {time.perf_counter() - start:.2f} s")
+    if len(responses):
+        print(f"pathology accuracy {responses['pathology_correct'].mean():.1%}, "
+              f"BI-RADS agreement {responses['birads_agree'].mean():.1%}, "
+              f"Brier {responses['brier'].mean():.3f}")
+    for path in paths:
+        print(f"  {path}")
@@ -0,0 +1,30 @@
+// Clientside answer check for "Submit & Next" (see handle_submit in testing_app.py)
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    answers: {
+        // Warn about missing answers without a server round trip; once everything
+        // is answered, pass the click on to handle_submit through submit-request.
+        check_answers: function (nClicks, pathology, birads, confidence) {
+            const noUpdate = window.dash_clientside.no_update;
+            const warning = function (text) {
+                return {
+                    namespace: "dash_bootstrap_components",
+                    type: "Alert",
+                    props: {children: text, color: "warning", style: {marginTop: "10px"}}
+                };
+            };
+            if (!nClicks) {
+                return [noUpdate, noUpdate];
+            }
+            if (pathology == null && birads == null && confidence == null) {
+                return [warning("Please answer all questions (BI-RADS, pathology, and confidence) before submitting."), noUpdate];
+            } else if (pathology == null) {
+                return [warning("Please answer the pathology question."), noUpdate];
+            } else if (birads == null) {
+                return [warning("Please answer the BI-RADS question."), noUpdate];
+            } else if (confidence == null) {
+                return [warning("Please provide your confidence level before submitting."), noUpdate];
+            }
+            return [null, nClicks];
+        }
+    }
+});
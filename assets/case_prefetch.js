@@ -0,0 +1,55 @@
+// Clientside callbacks for next-case prefetching (see prefetch_next_case in testing_app.py)
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    prefetch: {
+        // Show the case from the prefetch store (or the downloaded study, see
+        // study_download.js) if it is the one we just moved to, otherwise leave
+        // it to the server-side update_case_display.
+        apply_prefetched_case: function (caseId, prefetched, previousCaseId, ccFigure, mlFigure,
+                                         study, heldCaseIds) {
+            const noUpdate = window.dash_clientside.no_update;
+            if (caseId === previousCaseId) {
+                return Array(11).fill(noUpdate);
+            }
+            if (!prefetched || prefetched.case_id !== caseId) {
+                prefetched = (heldCaseIds || []).indexOf(caseId) !== -1 ? study.cases[caseId] : null;
+            }
+            if (!prefetched) {
+                return Array(11).fill(noUpdate);
+            }
+            // images already in browser storage are shown from there
+            const localLayout = window.dash_clientside.predownload.local_layout;
+            // the rest of the layout is shared by all cases: keep it, swap the
+            // traces and the case layout (see case_layout in testing_app.py)
+            const withData = function (figure, i) {
+                const layout = Object.assign({}, figure.layout, localLayout(prefetched.layout[i]));
+                return Object.assign({}, figure, {data: prefetched.data[i], layout: layout});
+            };
+            const labels = prefetched.labels;
+            return [
+                labels[0], labels[1], labels[2], labels[3], labels[4],
+                null, null,                 // reset pathology / BI-RADS answers
+                withData(ccFigure, 0), withData(mlFigure, 1),
+                null,                       // reset confidence
+                caseId
+            ];
+        },
+
+        // Start downloading the prefetched case's images when they are sent by
+        // URL (url transport), so the browser cache has them on Submit & Next.
+        preload_images: function (prefetched) {
+            const urls = [];
+            (prefetched ? prefetched.layout : []).forEach(function (layout) {
+                layout.images.forEach(function (image) {
+                    urls.push(image.source);
+                });
+            });
+            // keep references until the next case so the loads are not dropped
+            window._preloadedImages = urls.map(function (url) {
+                const img = new Image();
+                img.src = url;
+                return img;
+            });
+            return urls;
+        }
+    }
+});
@@ -0,0 +1,44 @@
+// Retry of Dash callback requests the server turned away because it was at capacity
+// (503 + Retry-After, see admit_callback in testing_app.py). Waits for Retry-After,
+// or an exponential backoff with jitter, and sends the same request again. Other
+// callbacks give up after MAX_RETRIES; a submission is resent until the server takes
+// it, so an answer is never lost to an overload.
+(function () {
+    const ENDPOINT = "/_dash-update-component";
+    const MAX_RETRIES = 6;
+    const BASE_DELAY_MS = 250;
+    const MAX_DELAY_MS = 8000;
+
+    const originalFetch = window.fetch.bind(window);
+
+    function delayMs(response, attempt) {
+        const backoff = Math.min(MAX_DELAY_MS, BASE_DELAY_MS * Math.pow(2, attempt));
+        const retryAfter = parseFloat(response.headers.get("Retry-After"));
+        const wait = isNaN(retryAfter) ? backoff : Math.max(retryAfter * 1000, backoff);
+        // spread the retries of many readers instead of sending them together
+        return Math.min(MAX_DELAY_MS, wait) * (0.5 + Math.random() / 2);
+    }
+
+    window.fetch = function (input, init) {
+        const url = typeof input === "string" ? input : input.url;
+        if (url.indexOf(ENDPOINT) === -1) {
+            return originalFetch(input, init);
+        }
+        const attempt = function (n) {
+            // a Request body can only be read once: send a copy each time
+            const request = typeof input === "string" ? input : input.clone();
+            return originalFetch(request, init).then(function (response) {
+                const submit = response.headers.get("X-Callback-Kind") === "submit";
+                if (response.status !== 503 || (n >= MAX_RETRIES && !submit)) {
+                    return response;
+                }
+                return new Promise(function (resolve) {
+                    setTimeout(resolve, delayMs(response, n));
+                }).then(function () {
+                    return attempt(n + 1);
+                });
+            });
+        };
+        return attempt(0);
+    };
+})();
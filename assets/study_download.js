@@ -0,0 +1,151 @@
+// Whole-study download (PREDOWNLOAD=1, see send_study_payloads in testing_app.py):
+// the images of every remaining case are fetched in reading order into the Cache
+// API, with progress shown in the info card, and case transitions show them from
+// there instead of the server. The Cache API needs a secure context (https or
+// localhost); elsewhere the images are kept in memory for the session only.
+(function () {
+    const CACHE_NAME = "mammo-case-images";
+    const PARALLEL = 2;
+    const MAX_ATTEMPTS = 4;
+    const RETRY_DELAY_MS = 1000;
+
+    // image URL -> object URL of the downloaded image
+    const localUrls = {};
+
+    function caseUrls(study, caseId) {
+        const urls = [];
+        study.cases[caseId].layout.forEach(function (layout) {
+            layout.images.forEach(function (image) {
+                urls.push(image.source);
+            });
+        });
+        return urls;
+    }
+
+    function imageUrls(study) {
+        const urls = [];
+        study.order.forEach(function (caseId) {
+            caseUrls(study, caseId).forEach(function (url) {
+                if (urls.indexOf(url) === -1) {
+                    urls.push(url);
+                }
+            });
+        });
+        return urls;
+    }
+
+    // cases whose images are all held in the browser, which the server then
+    // leaves to apply_prefetched_case
+    function showHeld(study) {
+        const held = study.order.filter(function (caseId) {
+            return caseUrls(study, caseId).every(function (url) { return localUrls[url]; });
+        });
+        window.dash_clientside.set_props("predownload-status", {data: held});
+    }
+
+    function showProgress(done, failed, total) {
+        const set = window.dash_clientside.set_props;
+        if (done + failed < total) {
+            set("predownload-progress", {
+                value: Math.round(100 * done / total),
+                label: "Downloading study: " + done + " / " + total + " images",
+                color: "info", striped: true, animated: true
+            });
+        } else if (failed) {
+            set("predownload-progress", {
+                value: Math.round(100 * done / total),
+                label: failed + (failed === 1 ? " image" : " images") +
+                    " not downloaded, loaded from the server when needed",
+                color: "warning", striped: false, animated: false
+            });
+        } else {
+            set("predownload-progress", {
+                value: 100, label: "Study downloaded", color: "success", striped: false, animated: false
+            });
+        }
+    }
+
+    function wait(ms) {
+        return new Promise(function (resolve) { setTimeout(resolve, ms); });
+    }
+
+    // the image as a Blob: from browser storage if it is there, else downloaded (and stored)
+    async function loadImage(cache, url) {
+        const stored = cache && await cache.match(url);
+        if (stored) {
+            return stored.blob();
+        }
+        for (let attempt = 1; ; attempt++) {
+            try {
+                const response = await fetch(url);
+                if (!response.ok) {
+                    throw new Error("HTTP " + response.status);
+                }
+                if (cache) {
+                    await cache.put(url, response.clone());
+                }
+                return response.blob();
+            } catch (e) {
+                if (attempt >= MAX_ATTEMPTS) {
+                    throw e;
+                }
+                await wait(RETRY_DELAY_MS * attempt);
+            }
+        }
+    }
+
+    async function download(study) {
+        const urls = imageUrls(study);
+        let cache = null;
+        try {
+            cache = window.caches ? await window.caches.open(CACHE_NAME) : null;
+        } catch (e) {
+            cache = null;     // storage blocked, e.g. private browsing
+        }
+        let next = 0, done = 0, failed = 0;
+        showProgress(done, failed, urls.length);
+        // a few downloads at a time, taken in reading order
+        const worker = async function () {
+            while (next < urls.length) {
+                const url = urls[next++];
+                try {
+                    if (!localUrls[url]) {
+                        localUrls[url] = URL.createObjectURL(await loadImage(cache, url));
+                    }
+                    done++;
+                    showHeld(study);
+                } catch (e) {
+                    failed++;       // its case stays with the server
+                }
+                showProgress(done, failed, urls.length);
+            }
+        };
+        const workers = [];
+        for (let i = 0; i < PARALLEL; i++) {
+            workers.push(worker());
+        }
+        await Promise.all(workers);
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        predownload: {
+            // Start the download; no case is held yet, showHeld lists them as
+            // their images arrive.
+            download_study: function (study) {
+                if (!study) {
+                    return null;
+                }
+                download(study);
+                return [];
+            },
+
+            // Case layout with the image sources replaced by downloaded copies, where there are any.
+            local_layout: function (layout) {
+                return Object.assign({}, layout, {images: layout.images.map(function (image) {
+                    const local = localUrls[image.source];
+                    return local ? Object.assign({}, image, {source: local}) : image;
+                })});
+            }
+        }
+    });
+})();
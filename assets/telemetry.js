@@ -0,0 +1,128 @@
+// Client-side transition timing: from a click on "Login" / "Submit & Next" until the
+// next case is shown and both the CC and ML graphs have finished plotting.
+// Measurements are batched and sent to /telemetry (see record_telemetry in testing_app.py).
+(function () {
+    const ENDPOINT = "/telemetry";
+    const BATCH_SIZE = 10;
+    const FLUSH_MS = 30000;
+    const TIMEOUT_MS = 60000;
+    const GRAPH_IDS = ["graph-px", "roi-px"];
+
+    let pending = null;
+    let queue = [];
+
+    function currentCaseId() {
+        const el = document.getElementById("case-id");
+        return el ? el.textContent : null;
+    }
+
+    function currentUser() {
+        try {
+            return JSON.parse(window.sessionStorage.getItem("session"));
+        } catch (e) {
+            return null;
+        }
+    }
+
+    // remember when each graph last finished plotting
+    function hookGraphs() {
+        GRAPH_IDS.forEach(function (id) {
+            const container = document.getElementById(id);
+            const gd = container && container.querySelector(".js-plotly-plot");
+            if (gd && gd.on && !gd._telemetryHooked) {
+                gd._telemetryHooked = true;
+                gd.on("plotly_afterplot", function () {
+                    gd._telemetryPlottedAt = performance.now();
+                });
+            }
+        });
+    }
+
+    function lastPlotTimes() {
+        return GRAPH_IDS.map(function (id) {
+            const container = document.getElementById(id);
+            const gd = container && container.querySelector(".js-plotly-plot");
+            return gd ? gd._telemetryPlottedAt : undefined;
+        });
+    }
+
+    function poll() {
+        if (!pending) {
+            return;
+        }
+        const now = performance.now();
+        if (now - pending.start > TIMEOUT_MS) {
+            pending = null;
+            return;
+        }
+        hookGraphs();
+        const caseId = currentCaseId();
+        if (pending.caseSeenAt === undefined && caseId !== null && caseId !== pending.fromCase) {
+            pending.caseSeenAt = now;
+        }
+        if (pending.caseSeenAt !== undefined) {
+            const plotted = lastPlotTimes();
+            // a plot can land in the same frame as the case change
+            const done = plotted.every(function (t) {
+                return t !== undefined && t >= pending.caseSeenAt - 50;
+            });
+            if (done) {
+                queue.push({
+                    user_id: currentUser(),
+                    // the study being read (see studies.py)
+                    path: window.location.pathname,
+                    kind: pending.kind,
+                    from_case_id: pending.fromCase,
+                    case_id: caseId,
+                    click_to_case_ms: Math.round(pending.caseSeenAt - pending.start),
+                    click_to_render_ms: Math.round(Math.max.apply(null, plotted) - pending.start),
+                    client_time: new Date().toISOString()
+                });
+                pending = null;
+                if (queue.length >= BATCH_SIZE) {
+                    flush();
+                }
+                return;
+            }
+        }
+        window.requestAnimationFrame(poll);
+    }
+
+    function flush() {
+        if (queue.length === 0) {
+            return;
+        }
+        const body = JSON.stringify(queue);
+        queue = [];
+        const blob = new Blob([body], {type: "application/json"});
+        if (!(navigator.sendBeacon && navigator.sendBeacon(ENDPOINT, blob))) {
+            fetch(ENDPOINT, {method: "POST", body: body, keepalive: true,
+                             headers: {"Content-Type": "application/json"}});
+        }
+    }
+
+    document.addEventListener("click", function (event) {
+        const button = event.target.closest && event.target.closest("#submit-button, #login-button");
+        if (!button) {
+            return;
+        }
+        const start = performance.now();
+        const startPoll = pending === null;
+        // the latest click before the case changes is the one that caused it
+        pending = {
+            kind: button.id === "login-button" ? "login" : "submit",
+            fromCase: currentCaseId(),
+            start: start
+        };
+        if (startPoll) {
+            window.requestAnimationFrame(poll);
+        }
+    }, true);
+
+    window.setInterval(flush, FLUSH_MS);
+    document.addEventListener("visibilitychange", function () {
+        if (document.visibilityState === "hidden") {
+            flush();
+        }
+    });
+})();
@@ -0,0 +1,517 @@
+"""
+Offline benchmark of the reading workflow.
+
+Generates a synthetic study (case CSV, PNG views, reader IDs) in a
+temporary directory, starts testing_app on a local threaded server and
+lets N simulated readers log in, resume and submit cases concurrently
+through the Dash callback endpoint (/_dash-update-component). Reports
+p50/p95/p99 latency per callback, throughput and memory per scenario,
+plus micro-benchmarks of the image, figure and storage helpers.
+
+    python benchmarks/bench_reading.py
+    python benchmarks/bench_reading.py --readers 1 10 50 --cases 40 --image-size 1600x1200
+    python benchmarks/bench_reading.py --json results.json
+    python benchmarks/bench_reading.py --baseline results.json   # exit 1 on regression
+
+Settings such as IMAGE_TRANSPORT or STORAGE_BACKEND are taken from the
+environment, as for the app itself.
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import logging
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CASE_HEADER = ["Order", "ID", "Age", "Race", "Ethnicity", "Size (mm)", "Pathology", "BI-RADS"]
+
+
+# -----------------------------
+# Synthetic study
+# -----------------------------
+def make_study(root, n_cases, image_size, n_readers, seed=0):
+    """Case CSV, images/testing_cases/T###{CC,ML}.png and valid_ids.csv under `root`."""
+    rng = np.random.default_rng(seed)
+    width, height = image_size
+    image_dir = os.path.join(root, "images", "testing_cases")
+    os.makedirs(image_dir, exist_ok=True)
+
+    yy, xx = np.mgrid[0:height, 0:width]
+    with open(os.path.join(root, "testing_cases.csv"), "w") as f:
+        f.write(",".join(CASE_HEADER) + "\n")
+        for case_id in range(1, n_cases + 1):
+            f.write(f"{case_id},{rng.integers(1, 999)},{rng.integers(35, 85)},"
+                    f"{rng.choice(['W', 'B', 'A'])},{rng.choice(['NH', 'H'])},"
+                    f"{rng.integers(2, 90)},{rng.choice(['Benign', 'Atypia', 'DCIS', 'Invasive'])},"
+                    f"{rng.integers(2, 5)}\n")
+            for view in ("CC", "ML"):
+                base = 110 + 50 * np.sin(xx / (40 + case_id)) * np.cos(yy / (60 + case_id))
+                img = np.clip(base + rng.normal(0, 8, base.shape), 0, 255).astype(np.uint8)
+                Image.fromarray(img).save(os.path.join(image_dir, f"T{case_id:03d}{view}.png"))
+
+    readers = [f"reader{i:04d}" for i in range(n_readers)]
+    with open(os.path.join(root, "valid_ids.csv"), "w") as f:
+        f.write("\n".join(readers) + "\n")
+    return readers
+
+
+# -----------------------------
+# Dash callback client
+# -----------------------------
+class DashClient:
+    """Calls Dash callbacks over HTTP the way the browser does."""
+
+    # like assets/retry.js: requests turned away with 503 are sent again
+    MAX_RETRIES = 6
+
+    def __init__(self, host, port, dependencies):
+        self.conn = http.client.HTTPConnection(host, port, timeout=120)
+        self.callbacks = dependencies
+        self.retries = 0
+
+    def call(self, output, values):
+        dep = self.callbacks[output]
+        outputs = []
+        for part in dep["output"].strip(".").split("..."):
+            component_id, prop = part.split(".", 1)
+            outputs.append({"id": component_id, "property": prop.split("@")[0]})
+        body = {
+            "output": dep["output"],
+            "outputs": outputs if len(outputs) > 1 else outputs[0],
+            "inputs": [{**i, "value": values.get(f"{i['id']}.{i['property']}")} for i in dep["inputs"]],
+            "state": [{**s, "value": values.get(f"{s['id']}.{s['property']}")} for s in dep["state"]],
+            "changedPropIds": [f"{i['id']}.{i['property']}" for i in dep["inputs"]],
+        }
+        payload = json.dumps(body)
+        start = time.perf_counter()
+        for attempt in range(self.MAX_RETRIES + 1):
+            self.conn.request("POST", "/_dash-update-component", body=payload,
+                              headers={"Content-Type": "application/json"})
+            response = self.conn.getresponse()
+            data = response.read()
+            if response.status != 503 or attempt == self.MAX_RETRIES:
+                break
+            self.retries += 1
+            retry_after = float(response.getheader("Retry-After") or 0)
+            time.sleep(min(8.0, max(retry_after, 0.25 * 2 ** attempt)) * (0.5 + np.random.random() / 2))
+        elapsed = time.perf_counter() - start
+        result = json.loads(data) if response.status == 200 and data else None
+        return response.status, result, len(data), elapsed
+
+
+def load_dependencies(host, port):
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    conn.request("GET", "/_dash-dependencies")
+    deps = json.loads(conn.getresponse().read())
+    # key each callback by its outputs without the duplicate-output suffix,
+    # preferring the server-side callback over clientside duplicates
+    by_output = {}
+    for dep in deps:
+        if dep.get("clientside_function"):
+            continue
+        key = "...".join(part.split("@")[0] for part in dep["output"].split("..."))
+        by_output.setdefault(key, dep)
+    return by_output
+
+
+LOGIN = "..session.data...login-message.children.."
+DISPLAY = "page-content.children"
+SUBMIT = "..case-id.children...submit-message.children...finished.data.."
+PREFETCH = "..prefetch-store.data...prefetch-case-id.data.."
+
+
+def find_output(deps, prefix):
+    return next(key for key in deps if key.startswith(prefix))
+
+
+def run_reader(host, port, deps, user_id, cases_per_reader, timings, errors, retries):
+    client = DashClient(host, port, deps)
+    update = find_output(deps, "..case-id-label.children")
+
+    def timed(name, output, values):
+        status, result, nbytes, elapsed = client.call(output, values)
+        timings.setdefault(name, []).append(elapsed)
+        if status not in (200, 204):
+            errors.append(f"{name}: HTTP {status}")
+        return result
+
+    timed("handle_login", LOGIN, {"login-button.n_clicks": 1, "user-id-input.value": user_id})
+    timed("display_page", DISPLAY, {"session.data": user_id, "finished.data": False})
+
+    case_id = "1"
+    previous = "1"
+    for n in range(1, cases_per_reader + 1):
+        timed("update_case_display", update, {"case-id.children": case_id,
+                                              "previous-case-id.data": previous})
+        if PREFETCH in deps:
+            timed("prefetch_next_case", PREFETCH, {"previous-case-id.data": case_id})
+        result = timed("handle_submit", SUBMIT, {
+            "submit-request.data": n,
+            "session.data": user_id,
+            "input-pathology.value": "Benign",
+            "input-birads.value": "BI-RADS 2",
+            "input-confidence.value": 50,
+            "case-id.children": case_id,
+        })
+        response = (result or {}).get("response", {})
+        if response.get("finished", {}).get("data"):
+            break
+        previous, case_id = case_id, response.get("case-id", {}).get("children", case_id)
+    retries.append(client.retries)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def run_scenario(host, port, deps, readers, cases_per_reader):
+    timings, errors, retries = {}, [], []
+    threads = [threading.Thread(target=run_reader,
+                                args=(host, port, deps, user_id, cases_per_reader, timings, errors,
+                                      retries))
+               for user_id in readers]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    result = {
+        "readers": len(readers),
+        "wall_s": wall,
+        "requests_per_s": sum(len(v) for v in timings.values()) / wall,
+        "submits_per_s": len(timings.get("handle_submit", [])) / wall,
+        "errors": len(errors),
+        "retries": sum(retries),
+        "callbacks": {},
+    }
+    for name, values in timings.items():
+        result["callbacks"][name] = {
+            "count": len(values),
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "mean_ms": statistics.fmean(values) * 1000,
+        }
+    return result
+
+
+# -----------------------------
+# Helper micro-benchmarks
+# -----------------------------
+def time_call(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {"p50_ms": percentile(samples, 50) * 1000, "max_ms": max(samples) * 1000}
+
+
+def reset_caches(ta, render_threads=4):
+    """Empty image, encoded image and figure caches in the imported app."""
+    from figure_cache import FigureCache
+    from image_store import CaseImages, ImageStore
+    from image_transport import EncodedImageCache
+
+    ta.image_store = ImageStore()
+    for study in ta.studies:
+        study.images = CaseImages(ta.image_store, study.image_dir)
+    ta.encoded_images = EncodedImageCache(ta.image_store.get)
+    ta.figure_cache = FigureCache(ta.render_case_fig, render_threads=render_threads)
+
+
+def run_micro(ta, repeat):
+    from image_pack import ImagePack, build_image_pack
+    from image_store import CaseImages, ImageStore
+    from storage import CsvStorage, SqliteStorage
+
+    study = ta.studies.default
+    case_id = study.case_index.first_id
+    results = {}
+
+    results["decode_png (cold load_imgs view)"] = time_call(
+        lambda: CaseImages(ImageStore(), study.image_dir).get(case_id, "CC"), repeat)
+    pack_dir = tempfile.mkdtemp(prefix="bench-pack-")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_image_pack(study.image_dir, pack_dir)
+        results["image pack view (mmap)"] = time_call(
+            lambda: CaseImages(ImageStore(pack=ImagePack(pack_dir)), study.image_dir).get(case_id, "CC"),
+            repeat)
+    finally:
+        shutil.rmtree(pack_dir, ignore_errors=True)
+    results["load_imgs (cached)"] = time_call(lambda: ta.load_imgs(case_id), repeat)
+
+    image = study.images.get(case_id, "CC")
+    for transport in ("raw", "png", "jpeg"):
+        results[f"create_image_fig ({transport})"] = time_call(
+            lambda: ta.create_image_fig(image, transport=transport), repeat)
+
+    row = ["bench", "2024-01-01T00:00:00", "1", "1", "Benign", "BI-RADS 2", "50%"]
+    tmp = tempfile.mkdtemp(prefix="bench-storage-")
+    try:
+        csv_storage = CsvStorage(tmp)
+        results["csv append (1 row)"] = time_call(lambda: csv_storage.append_rows([row]), repeat)
+        results["csv resume read"] = time_call(lambda: csv_storage.user_progress("bench"), repeat)
+        sqlite_storage = SqliteStorage(os.path.join(tmp, "bench.db"))
+        counter = iter(range(10 ** 9))
+        results["sqlite append (1 row)"] = time_call(
+            lambda: sqlite_storage.append_rows([row[:1] + [str(next(counter))] + row[2:]]), repeat)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return results
+
+
+def cold_burst(ta, n_readers):
+    """
+    Renders done when `n_readers` readers open the first case at the same
+    moment with empty caches; concurrent misses should share one render per view.
+    """
+    reset_caches(ta, ta.RENDER_THREADS)
+    study = ta.studies.default
+    barrier = threading.Barrier(n_readers)
+
+    def open_case():
+        barrier.wait()
+        ta.case_payload(study, study.case_index.first_id)
+
+    threads = [threading.Thread(target=open_case) for _ in range(n_readers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = ta.figure_cache.stats()
+    return {"readers": n_readers, "seconds": time.perf_counter() - start,
+            "renders": stats["renders"], "coalesced": stats["renders_coalesced"]}
+
+
+def count_loads_per_login(ta, user_id):
+    """
+    Image decodes and figure renders caused by one login with cold caches:
+    each view of the start case should be loaded exactly once, and the
+    reading screen filled.
+    """
+    reset_caches(ta)
+    client = ta.app.server.test_client()
+    host_deps = {}
+    for dep in client.get("/_dash-dependencies").get_json():
+        if not dep.get("clientside_function"):
+            key = "...".join(part.split("@")[0] for part in dep["output"].split("..."))
+            host_deps.setdefault(key, dep)
+
+    def call(output, values):
+        dep = host_deps[output]
+        outputs = [dict(zip(("id", "property"), part.split("@")[0].split(".", 1)))
+                   for part in dep["output"].strip(".").split("...")]
+        response = client.post("/_dash-update-component", json={
+            "output": dep["output"],
+            "outputs": outputs if len(outputs) > 1 else outputs[0],
+            "inputs": [{**i, "value": values.get(f"{i['id']}.{i['property']}")} for i in dep["inputs"]],
+            "state": [{**s, "value": values.get(f"{s['id']}.{s['property']}")} for s in dep["state"]],
+            "changedPropIds": [f"{i['id']}.{i['property']}" for i in dep["inputs"]],
+        })
+        return response.get_json(silent=True) or {}
+
+    # the chain the browser runs: the main layout is a skeleton with the
+    # start case in it, handle_submit passes that case on (it is called when
+    # the layout is inserted) and update_case_display fills the screen
+    start_case_id = ta.get_start_case_for_user(ta.studies.default, user_id)
+    call(LOGIN, {"login-button.n_clicks": 1, "user-id-input.value": user_id})
+    call(DISPLAY, {"session.data": user_id, "finished.data": False})
+    submitted = call(find_output(host_deps, "..case-id.children"),
+                     {"session.data": user_id, "case-id.children": start_case_id})
+    case_id = submitted.get("response", {}).get("case-id", {}).get("children")
+    shown = {}
+    if case_id is not None:     # otherwise the browser drops update_case_display
+        shown = call(find_output(host_deps, "..case-id-label.children"),
+                     {"case-id.children": case_id, "previous-case-id.data": start_case_id})
+    return {"image_decodes": ta.image_store.stats()["misses"],
+            "figure_renders": ta.figure_cache.stats()["misses"],
+            "filled": "case-id-label" in shown.get("response", {})}
+
+
+# modules the app must not load at import time (see README: startup)
+DEFERRED_MODULES = ("pandas", "plotly.express", "skimage")
+IMPORT_SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+import testing_app
+print(json.dumps({{"seconds": time.perf_counter() - start,
+                  "deferred_loaded": [m for m in {DEFERRED_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(root, runs=3):
+    """Fastest of `runs` cold imports of testing_app, each in a fresh interpreter."""
+    env = {**os.environ, "PYTHONPATH": REPO_DIR, "LOG_LEVEL": "WARNING"}
+    best = None
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=root, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    return best
+
+
+# -----------------------------
+# Reporting
+# -----------------------------
+def print_scenario(result):
+    print(f"\n{result['readers']} concurrent readers: {result['wall_s']:.1f} s, "
+          f"{result['requests_per_s']:.1f} req/s, {result['submits_per_s']:.1f} submits/s, "
+          f"{result['errors']} errors, {result['retries']} retries (503), RSS {result['rss_mb']:.0f} MB (peak {result['peak_rss_mb']:.0f} MB)")
+    print(f"  {'callback':<22}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in sorted(result["callbacks"].items()):
+        print(f"  {name:<22}{stats['count']:>7}{stats['p50_ms']:>10.1f}"
+              f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """p95 latencies more than `tolerance` times the baseline's (and 5 ms slower)."""
+    regressions = []
+    old_scenarios = {s["readers"]: s for s in baseline.get("scenarios", [])}
+    for scenario in results["scenarios"]:
+        old = old_scenarios.get(scenario["readers"])
+        if old is None:
+            continue
+        for name, stats in scenario["callbacks"].items():
+            old_stats = old["callbacks"].get(name)
+            if old_stats and stats["p95_ms"] > max(old_stats["p95_ms"] * tolerance,
+                                                   old_stats["p95_ms"] + 5):
+                regressions.append(f"{scenario['readers']} readers, {name}: p95 "
+                                   f"{old_stats['p95_ms']:.1f} -> {stats['p95_ms']:.1f} ms")
+    for name, stats in results.get("micro", {}).items():
+        old_stats = baseline.get("micro", {}).get(name)
+        if old_stats and stats["p50_ms"] > max(old_stats["p50_ms"] * tolerance,
+                                               old_stats["p50_ms"] + 1):
+            regressions.append(f"{name}: p50 {old_stats['p50_ms']:.2f} -> {stats['p50_ms']:.2f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--readers", type=int, nargs="+", default=[1, 10, 50],
+                        help="concurrent reader counts, one scenario each")
+    parser.add_argument("--cases", type=int, default=40, help="cases in the synthetic study")
+    parser.add_argument("--cases-per-reader", type=int, default=None,
+                        help="submissions per reader (default: all cases)")
+    parser.add_argument("--image-size", default="1600x1200", help="WIDTHxHEIGHT of every view")
+    parser.add_argument("--repeat", type=int, default=20, help="repetitions per micro-benchmark")
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic study directory")
+    parser.add_argument("--json", help="write all results to this file")
+    parser.add_argument("--baseline", help="results JSON to compare against; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="allowed slowdown factor against the baseline")
+    parser.add_argument("--import-budget", type=float, default=2.0,
+                        help="maximum seconds for `import testing_app`")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.image_size.lower().split("x"))
+    root = tempfile.mkdtemp(prefix="bench-study-")
+    n_readers = sum(args.readers) + 1
+    print(f"Generating {args.cases} cases of {width}x{height} in {root} ...")
+    readers = make_study(root, args.cases, (width, height), n_readers)
+
+    results = {"cases": args.cases, "image_size": args.image_size,
+               "import": measure_import(root)}
+    print(f"import testing_app: {results['import']['seconds']:.2f} s")
+
+    # the app reads its data relative to the working directory
+    os.chdir(root)
+    sys.path.insert(0, REPO_DIR)
+    from werkzeug.serving import make_server
+    import testing_app as ta
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    results.update(transport=ta.IMAGE_TRANSPORT, storage=ta.STORAGE_BACKEND)
+    results["loads_per_login"] = count_loads_per_login(ta, readers.pop())
+    results["cold_burst"] = cold_burst(ta, max(args.readers))
+    print(f"cold start, {results['cold_burst']['readers']} readers on case 1: "
+          f"{results['cold_burst']['renders']} renders, "
+          f"{results['cold_burst']['coalesced']} coalesced, {results['cold_burst']['seconds']:.2f} s")
+
+    start = time.perf_counter()
+    ta.warm_caches(background=False)
+    results["warm_s"] = time.perf_counter() - start
+    print(f"Caches warmed in {results['warm_s']:.1f} s")
+
+    server = make_server("127.0.0.1", 0, ta.app.server, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = "127.0.0.1", server.server_port
+    deps = load_dependencies(host, port)
+
+    results["scenarios"] = []
+    for n in args.readers:
+        scenario_readers, readers = readers[:n], readers[n:]
+        scenario = run_scenario(host, port, deps, scenario_readers,
+                                args.cases_per_reader or args.cases)
+        for study in ta.studies:
+            study.response_writer.flush()
+        scenario["rss_mb"] = rss_mb()
+        scenario["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        results["scenarios"].append(scenario)
+        print_scenario(scenario)
+
+    results["micro"] = run_micro(ta, args.repeat)
+    print("\nhelpers")
+    for name, stats in results["micro"].items():
+        print(f"  {name:<36}p50 {stats['p50_ms']:8.2f} ms   max {stats['max_ms']:8.2f} ms")
+    print(f"  image loads per login (cold): {results['loads_per_login']}")
+
+    server.shutdown()
+    os.chdir(REPO_DIR)
+    if not args.keep:
+        shutil.rmtree(root, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1)
+
+    failed = []
+    if results["import"]["seconds"] > args.import_budget:
+        failed.append(f"import testing_app took {results['import']['seconds']:.2f} s "
+                      f"(budget {args.import_budget} s)")
+    if results["import"]["deferred_loaded"]:
+        failed.append(f"imported at startup: {results['import']['deferred_loaded']}")
+    if results["cold_burst"]["renders"] > 2:
+        failed.append(f"concurrent cold requests rendered case 1 more than once: {results['cold_burst']}")
+    loads = results["loads_per_login"]
+    if not loads["filled"]:
+        failed.append("a login does not fill the reading screen")
+    elif loads["image_decodes"] != 2 or loads["figure_renders"] != 2:
+        failed.append(f"a login does not load each image of the start case exactly once: {loads}")
+    if any(s["errors"] for s in results["scenarios"]):
+        failed.append("callbacks returned errors")
+    if args.baseline:
+        with open(args.baseline) as f:
+            failed += compare_to_baseline(results, json.load(f), args.tolerance)
+    if failed:
+        print("\nFAILED:\n  " + "\n  ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import csv
+from types import MappingProxyType
+
+CASE_FIELDS = (
+    "case_id",
+    "id",
+    "patient_age",
+    "patient_race",
+    "patient_ethnicity",
+    "calcification_span",
+    "correct_pathology",
+    "correct_BIRADS",
+)
+
+# testing_cases.csv column -> CaseRecord field
+CSV_COLUMNS = {
+    "Order": "case_id",              # used as the main case identifier
+    "ID": "id",                      # used for display
+    "Age": "patient_age",
+    "Race": "patient_race",
+    "Ethnicity": "patient_ethnicity",
+    "Size (mm)": "calcification_span",
+    "Pathology": "correct_pathology",
+    "BI-RADS": "correct_BIRADS",
+}
+
+
+def parse_value(text):
+    """CSV cell as int, float or str; empty cells become None."""
+    text = text.strip()
+    if not text:
+        return None
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
+
+class CaseRecord:
+    """One row of the case table, plus its position in reading order."""
+
+    __slots__ = CASE_FIELDS + ("position",)
+
+    def __init__(self, position, **fields):
+        object.__setattr__(self, "position", position)
+        for name in CASE_FIELDS:
+            object.__setattr__(self, name, fields.get(name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CaseRecord is immutable")
+
+    def __repr__(self):
+        return f"CaseRecord(case_id={self.case_id!r}, position={self.position})"
+
+
+class CaseIndex:
+    """
+    Immutable lookup structure over the cases in reading order, built
+    once at startup: case_id -> record, position and next case are all
+    O(1) instead of a scan over the case table.
+
+    Case ids are accepted as int or str (the Dash components hold str) and
+    returned as str.
+    """
+
+    def __init__(self, records):
+        records = tuple(
+            CaseRecord(position, **{**fields, "case_id": int(fields["case_id"])})
+            for position, fields in enumerate(records)
+        )
+        if not records:
+            raise ValueError("Case list is empty")
+        self.records = records
+        self.ids = tuple(str(r.case_id) for r in records)
+        self._by_id = MappingProxyType({r.case_id: r for r in records})
+        if len(self._by_id) != len(records):
+            raise ValueError("Duplicate case_id in case list")
+        # id of the case after each position; None after the last one
+        self._following = self.ids[1:] + (None,)
+
+    @classmethod
+    def from_csv(cls, path, columns=CSV_COLUMNS):
+        """Read the case table with the csv module (no pandas import at startup)."""
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        return cls(
+            {columns.get(name, name): parse_value(value or "") for name, value in row.items()}
+            for row in rows
+        )
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    @property
+    def first_id(self):
+        return self.ids[0]
+
+    def get(self, case_id):
+        """Record of a case, or None for an unknown / malformed id."""
+        try:
+            return self._by_id.get(int(case_id))
+        except (TypeError, ValueError):
+            return None
+
+    def position(self, case_id):
+        record = self.get(case_id)
+        return None if record is None else record.position
+
+    def following_id(self, case_id):
+        """Next case in reading order, None after the last case or for unknown ids."""
+        record = self.get(case_id)
+        return None if record is None else self._following[record.position]
+
+    def next_id(self, case_id):
+        """Next case in reading order, wrapping to the first case (also for unknown ids)."""
+        return self.following_id(case_id) or self.first_id
+
+    def is_last(self, case_id):
+        record = self.get(case_id)
+        return record is not None and record.position == len(self.records) - 1
@@ -0,0 +1,224 @@
+"""
+Incremental compaction of the submissions into one study dataset.
+
+    python compaction.py                     # output/*_testing.csv -> output/compacted/
+    python compaction.py --every 60          # keep compacting once a minute
+    STUDIES_FILE=studies.json python compaction.py
+
+Each run reads only what was appended since the last one: the byte offset
+reached in every <user>_testing.csv (or the last rowid with
+STORAGE_BACKEND=sqlite) is kept in state.json, and a file that was
+replaced or truncated is read again from the start. The new rows are added to
+
+  responses/study=<study>/date=<YYYY-MM-DD>/part-<run>.<fmt>
+                  every submission, in the order it was received
+  latest/study=<study>/<user>.<fmt>
+                  the last answer of the reader to each case; only the
+                  files of readers with new submissions are rewritten
+
+as Parquet when pyarrow is installed (CSV otherwise, or with --format csv).
+A run costs time in proportion to the new submissions, not the whole
+study; `python analytics.py --storage compacted` scores from latest/.
+"""
+import contextlib
+import glob
+import json
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+
+import pandas as pd
+
+from analytics import last_answers, parquet_available, parse_result_rows
+from storage import RESULT_HEADER, RESULTS_SUFFIX
+from studies import Study, StudyRegistry
+
+try:
+    import fcntl
+except ImportError:     # Windows: do not run two compactions at once
+    fcntl = None
+
+STATE_FILE = "state.json"
+STATE_VERSION = 1
+
+
+# -----------------------------
+# Reading new submissions
+# -----------------------------
+def read_appended(path, source):
+    """
+    Complete rows appended to a result CSV since `source` (its entry in
+    the state, updated in place), as bytes without the header.
+    """
+    stat = os.stat(path)
+    offset = source.get("offset", 0)
+    if source.get("inode") != stat.st_ino or stat.st_size < offset:
+        offset = 0      # new, replaced or truncated file
+    if stat.st_size == offset:
+        return b""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read(stat.st_size - offset)
+    data = data[:data.rfind(b"\n") + 1]    # a row still being written waits for the next run
+    source.update(inode=stat.st_ino, offset=offset + len(data))
+    if offset == 0 and data.startswith(b"userID,"):
+        data = data[data.find(b"\n") + 1:]
+    return data
+
+
+def new_csv_rows(output_dir, sources):
+    chunks = []
+    for path in sorted(glob.glob(os.path.join(output_dir, f"*{RESULTS_SUFFIX}"))):
+        chunks.append(read_appended(path, sources.setdefault(os.path.basename(path), {})))
+    return parse_result_rows(chunks)
+
+
+def new_sqlite_rows(db_path, sources):
+    source = sources.setdefault(os.path.basename(db_path), {})
+    if not os.path.exists(db_path):
+        return parse_result_rows([])
+    with sqlite3.connect(db_path) as conn:
+        columns = ", ".join("user_id AS userID" if c == "userID" else c for c in RESULT_HEADER)
+        rows = pd.read_sql_query(f"SELECT rowid, {columns} FROM responses WHERE rowid > ? ORDER BY rowid",
+                                 conn, params=(source.get("rowid", 0),), dtype=str)
+    if len(rows):
+        source["rowid"] = int(rows["rowid"].iloc[-1])
+    return rows.drop(columns="rowid")
+
+
+# -----------------------------
+# Dataset
+# -----------------------------
+def write_frame(df, path, fmt):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    if fmt == "parquet":
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def read_frame(path):
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+class Compactor:
+    """
+    The compacted dataset at `dest`: `run(study, backend)` adds the
+    submissions of one study stored since the previous run.
+    """
+
+    def __init__(self, dest, fmt="auto"):
+        self.dest = dest
+        os.makedirs(dest, exist_ok=True)
+        self.state_path = os.path.join(dest, STATE_FILE)
+        if fmt == "auto":
+            fmt = "parquet" if parquet_available() else "csv"
+        self.fmt = fmt
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                self.state = json.load(f)
+            # the dataset keeps the format it was started with
+            self.fmt = self.state["format"]
+        else:
+            self.state = {"version": STATE_VERSION, "format": self.fmt, "studies": {}}
+
+    @contextlib.contextmanager
+    def lock(self):
+        """Exclusive use of the dataset (against other compaction processes), with fresh state."""
+        with open(os.path.join(self.dest, ".lock"), "w") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            self.load()
+            yield
+
+    def run(self, study, backend="csv"):
+        """Compact the new submissions of `study`; returns how many rows were added."""
+        sources = self.state["studies"].setdefault(study.name, {}).setdefault(backend, {})
+        if backend == "sqlite":
+            rows = new_sqlite_rows(study.sqlite_path, sources)
+        else:
+            rows = new_csv_rows(study.output_dir, sources)
+        rows = rows.dropna(subset=["userID", "case_id"])
+        if len(rows):
+            # runs can start within the same second (--every below 1 s): the
+            # random suffix keeps their parts apart, the timestamp in order
+            run_id = time.strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            dates = rows["timestamp"].str[:10].where(rows["timestamp"].str.match(r"\d{4}-\d\d-\d\d", na=False), "unknown")
+            for date, part in rows.groupby(dates):
+                write_frame(part, self.path("responses", study.name, f"date={date}", f"part-{run_id}"), self.fmt)
+            for user_id, new in rows.groupby("userID"):
+                path = self.path("latest", study.name, user_id)
+                if os.path.exists(path):
+                    new = pd.concat([read_frame(path), new], ignore_index=True)
+                write_frame(last_answers(new), path, self.fmt)
+        # rows are in the dataset before their offsets are: a crash in
+        # between ingests them again, which latest/ absorbs
+        self.save()
+        return len(rows)
+
+    def path(self, table, study_name, *parts):
+        return os.path.join(self.dest, table, f"study={study_name}", *parts[:-1], f"{parts[-1]}.{self.fmt}")
+
+    def save(self):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, indent=1)
+        os.replace(tmp, self.state_path)
+
+
+def load_latest(dest, study_name="testing"):
+    """Last answer of every reader to every case of a study, from a compacted dataset."""
+    paths = sorted(glob.glob(os.path.join(dest, "latest", f"study={study_name}", "*.*")))
+    paths = [p for p in paths if not p.endswith(".tmp")]
+    if not paths:
+        return pd.DataFrame(columns=RESULT_HEADER, dtype=str)
+    return pd.concat([read_frame(p) for p in paths], ignore_index=True)
+
+
+def rebuild(dest):
+    """Drop a compacted dataset, so the next run reads every submission again."""
+    shutil.rmtree(dest, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Add new submissions to the compacted study dataset.")
+    parser.add_argument("--studies", default=os.environ.get("STUDIES_FILE"),
+                        help="studies file (see studies.py); default: the testing study in output/")
+    parser.add_argument("--storage", choices=("csv", "sqlite"),
+                        default=os.environ.get("STORAGE_BACKEND", "csv"))
+    parser.add_argument("--db", default=os.environ.get("SQLITE_PATH"),
+                        help="database of the testing study (default output/responses.db)")
+    parser.add_argument("--dest", default=os.path.join("output", "compacted"))
+    parser.add_argument("--format", choices=("auto", "csv", "parquet"), default="auto",
+                        help="format of a new dataset; an existing one keeps its format")
+    parser.add_argument("--every", type=float, default=0, help="repeat every this many seconds")
+    parser.add_argument("--rebuild", action="store_true", help="start the dataset over")
+    args = parser.parse_args()
+
+    if args.studies:
+        studies = StudyRegistry.from_file(args.studies)
+    else:
+        studies = StudyRegistry([Study("testing", sqlite=args.db)])
+    if args.rebuild:
+        rebuild(args.dest)
+    compactor = Compactor(args.dest, args.format)
+    while True:
+        start = time.perf_counter()
+        with compactor.lock():
+            added = {study.name: compactor.run(study, args.storage) for study in studies}
+        print(f"{time.strftime('%H:%M:%S')} added {added} in {time.perf_counter() - start:.2f} s "
+              f"-> {args.dest} ({compactor.fmt})")
+        if not args.every:
+            break
+        time.sleep(args.every)
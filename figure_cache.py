@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import plotly.io as pio
+
+from image_store import ByteLRU
+from single_flight import SingleFlight
+
+
+# -----------------------------
+# Serialized figure cache
+# -----------------------------
+class FigureCache:
+    """
+    Caches the figure of each image as plain JSON data, so a callback can
+    hand Dash the cached dict without rebuilding the figure from the image
+    array.
+
+    `render(key)` builds the plotly figure of an image key (see
+    ImageStore.key) on a miss. Entries are bounded by the size of their
+    serialized JSON (`max_bytes`, None = unbounded).
+
+    Misses are rendered in a pool of `render_threads` threads; concurrent
+    misses on the same image (e.g. a cohort logging in on case 1) share one
+    render instead of each doing it.
+    """
+
+    def __init__(self, render, max_bytes=None, render_threads=4):
+        self._render = render
+        self._cache = ByteLRU(max_bytes, sizeof=lambda entry: entry[1])
+        self._renders = SingleFlight(render_threads, name="figure-render")
+        self._prefetcher = None
+        self._prefetcher_pid = None
+        self.prefetches = 0
+
+    def get(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            entry = self._renders.do(key, self._build, key)
+        return entry[0]
+
+    def _build(self, key):
+        # a render that finished just before this one was started
+        entry = self._cache.peek(key)
+        if entry is None:
+            fig_json = pio.to_json(self._render(key), validate=False)
+            entry = self._cache.put(key, (json.loads(fig_json), len(fig_json)))
+        return entry
+
+    def warm(self, keys, background=True):
+        """
+        Render the figures of the given image keys. With `background=True`
+        this runs in a daemon thread and the thread is returned.
+        """
+        def run():
+            for key in keys:
+                try:
+                    self.get(key)
+                except FileNotFoundError:
+                    # reported by the image store warm-up
+                    pass
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="figure-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def prefetch(self, keys):
+        """Render the given image keys in the background (no-op if already cached)."""
+        def run():
+            for key in keys:
+                try:
+                    self.get(key)
+                except FileNotFoundError:
+                    pass
+
+        if self._prefetcher_pid != os.getpid():
+            # worker threads do not survive a fork; start a pool per process
+            self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="figure-prefetch")
+            self._prefetcher_pid = os.getpid()
+        self.prefetches += 1
+        return self._prefetcher.submit(run)
+
+    def stats(self):
+        stats = self._cache.stats()
+        stats["prefetches"] = self.prefetches
+        renders = self._renders.stats()
+        stats["renders"] = renders["executions"]
+        stats["renders_coalesced"] = renders["coalesced"]
+        return stats
@@ -0,0 +1,29 @@
+# gunicorn settings for running the study with a full reader cohort:
+#
+#     pip install gunicorn
+#     gunicorn -c gunicorn.conf.py wsgi:server
+#
+# Memory budget: the image/figure caches are built once in the master and
+# shared by all workers (preload_app), so roughly
+#
+#     total RSS ~= shared caches + WEB_WORKERS * per-worker overhead
+#
+# where the shared caches are ~ (decoded image bytes + serialized figure bytes)
+# for all cases (see IMAGE_CACHE_MB / FIGURE_CACHE_MB, about 4 MB + 4 MB per
+# 1600x1200 case with two views) and the per-worker overhead is ~150 MB
+# (Python, Dash, plotly). Pick WEB_WORKERS = min(CPU cores,
+# (memory budget - shared caches) / 150 MB); each worker serves
+# WEB_THREADS requests concurrently, which suits the I/O-light callbacks.
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8053")
+workers = int(os.environ.get("WEB_WORKERS", min(multiprocessing.cpu_count(), 4)))
+threads = int(os.environ.get("WEB_THREADS", "8"))
+worker_class = "gthread"
+preload_app = True
+timeout = 60
+keepalive = 5
+# recycle workers now and then so copy-on-write drift does not add up
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", "5000"))
+max_requests_jitter = 500
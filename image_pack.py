@@ -0,0 +1,185 @@
+"""
+All case images in one memory-mapped file.
+
+Build it once, offline, from the case PNGs:
+
+    python image_pack.py                         # images/testing_cases -> images/pack
+    python image_pack.py SRC_DIR [SRC_DIR ...] --dest DEST_DIR
+
+This writes
+
+    DEST_DIR/images.bin       raw pixel arrays, each starting on a page boundary
+    DEST_DIR/manifest.json    key, shape, dtype, offset, nbytes, crc32 of every
+                              image and the case PNGs (path, case_id, view) it
+                              was built from
+
+Images are keyed by the digest of their PNG (image_store.file_digest), so a
+case image shared by several studies is stored once.
+
+Images are stored grayscale: RGB(A) PNGs whose colour channels are equal
+keep one channel (and drop a fully opaque alpha channel); 16-bit images
+stay uint16. With IMAGE_SOURCE=pack the app maps this file instead of
+decoding PNGs, so every worker shares the same pages through the OS page
+cache, and it refuses to start if an image is missing, corrupt or older
+than its PNG.
+"""
+import json
+import os
+import re
+import zlib
+
+import numpy as np
+
+from image_store import VIEWS, file_digest
+
+PACK_FILE = "images.bin"
+MANIFEST_FILE = "manifest.json"
+ALIGN = 4096
+VERSION = 2
+NAME_RE = re.compile(r"^T(\d+)(" + "|".join(VIEWS) + r")\.png$", re.IGNORECASE)
+
+
+# -----------------------------
+# Offline build
+# -----------------------------
+def to_grayscale(img):
+    """Drop redundant channels; images with real colour are kept as they are."""
+    if img.ndim == 3 and img.shape[2] in (2, 4) and np.all(img[..., -1] == np.iinfo(img.dtype).max):
+        img = img[..., :-1]
+    if img.ndim == 3 and img.shape[2] == 1:
+        img = img[..., 0]
+    if img.ndim == 3 and img.shape[2] == 3 and np.array_equal(img[..., 0], img[..., 1]) \
+            and np.array_equal(img[..., 0], img[..., 2]):
+        img = img[..., 0]
+    return np.ascontiguousarray(img)
+
+
+def build_image_pack(src_dirs, dest_dir):
+    from skimage import io
+
+    if isinstance(src_dirs, str):
+        src_dirs = [src_dirs]
+    os.makedirs(dest_dir, exist_ok=True)
+    entries = {}
+    pack_path = os.path.join(dest_dir, PACK_FILE)
+    with open(pack_path + ".tmp", "wb") as f:
+        for src_dir in src_dirs:
+            for name in sorted(os.listdir(src_dir)):
+                match = NAME_RE.match(name)
+                if match is None:
+                    continue
+                path = os.path.normpath(os.path.join(src_dir, name))
+                source = {"path": path, "case_id": int(match.group(1)), "view": match.group(2).upper()}
+                key = file_digest(path)
+                if key in entries:
+                    entries[key]["sources"].append(source)
+                    print(f"{path}: same image as {entries[key]['sources'][0]['path']}")
+                    continue
+                img = to_grayscale(io.imread(path))
+                if img.dtype not in (np.uint8, np.uint16):
+                    raise ValueError(f"{path}: unsupported dtype {img.dtype}")
+                offset = (f.tell() + ALIGN - 1) // ALIGN * ALIGN
+                f.seek(offset)
+                data = img.tobytes()
+                f.write(data)
+                entries[key] = {
+                    "key": key,
+                    "shape": list(img.shape),
+                    "dtype": img.dtype.str,
+                    "offset": offset,
+                    "nbytes": len(data),
+                    "crc32": zlib.crc32(data),
+                    "sources": [source],
+                }
+                print(f"{path}: {img.shape} {img.dtype} at {offset}")
+    os.replace(pack_path + ".tmp", pack_path)
+
+    manifest = {"version": VERSION, "file": PACK_FILE, "images": list(entries.values())}
+    with open(os.path.join(dest_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+# -----------------------------
+# Reading the pack
+# -----------------------------
+class ImagePack:
+    """
+    Read-only arrays backed by a memory map of the pack file: getting an
+    image copies nothing, pages are read from disk (or the shared page
+    cache) when the figure is rendered.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        manifest_path = os.path.join(root, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(
+                f"No image pack at {manifest_path} (build it with `python image_pack.py`)")
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("version") != VERSION:
+            raise ValueError(f"Image pack {root} has an old format, rebuild it with `python image_pack.py`")
+        self.entries = {e["key"]: e for e in manifest["images"]}
+        self.sources = {s["path"]: e["key"] for e in manifest["images"] for s in e["sources"]}
+        self.path = os.path.join(root, manifest["file"])
+        self._map = np.memmap(self.path, dtype=np.uint8, mode="r")
+        self.hits = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def key_for(self, path):
+        """Key of the image packed from the PNG at `path`, None if it is not in the pack."""
+        return self.sources.get(os.path.normpath(path))
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            raise FileNotFoundError(f"Image pack {self.root} has no image {key}")
+        self.hits += 1
+        raw = self._map[entry["offset"]:entry["offset"] + entry["nbytes"]]
+        return np.asarray(raw).view(np.dtype(entry["dtype"])).reshape(entry["shape"])
+
+    def validate(self, paths, checksums=True):
+        """
+        Problems that would break a reading session: missing images (given
+        as the paths of their PNGs), entries past the end of the file and
+        (with `checksums`) corrupted pixel data and PNGs changed since the
+        pack was built. An empty list means the pack is good.
+        """
+        problems = []
+        for path in paths:
+            key = self.key_for(path)
+            if key is None:
+                problems.append(f"no image for {path}")
+            elif checksums and os.path.exists(path) and file_digest(path) != key:
+                problems.append(f"{path} changed since the pack was built")
+        for key, entry in sorted(self.entries.items()):
+            name = entry["sources"][0]["path"]
+            expected = int(np.prod(entry["shape"])) * np.dtype(entry["dtype"]).itemsize
+            if entry["nbytes"] != expected or entry["offset"] + entry["nbytes"] > len(self._map):
+                problems.append(f"{name}: truncated or malformed entry")
+            elif checksums:
+                raw = self._map[entry["offset"]:entry["offset"] + entry["nbytes"]]
+                if zlib.crc32(raw) != entry["crc32"]:
+                    problems.append(f"{name}: checksum mismatch")
+        return problems
+
+    def stats(self):
+        # same keys as ByteLRU.stats(); nothing is ever missed or evicted
+        return {"entries": len(self.entries), "bytes": len(self._map), "max_bytes": None,
+                "hits": self.hits, "misses": 0, "evictions": 0}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pack all case images into one memory-mappable file.")
+    parser.add_argument("src", nargs="*", default=["images/testing_cases"],
+                        help="case image directories, e.g. one per study")
+    parser.add_argument("--dest", default="images/pack")
+    args = parser.parse_args()
+    manifest = build_image_pack(args.src, args.dest)
+    total = sum(e["nbytes"] for e in manifest["images"])
+    print(f"{len(manifest['images'])} images, {total / 2 ** 20:.0f} MB -> {args.dest}")
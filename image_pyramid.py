@@ -0,0 +1,181 @@
+"""
+Multi-resolution tile pyramid for the mag views.
+
+Build it once, offline, from the case PNGs:
+
+    python image_pyramid.py                      # images/testing_cases -> images/pyramid
+    python image_pyramid.py SRC_DIR DEST_DIR --tile-size 512 --overview 1024
+
+For every image (e.g. T001CC.png) this writes
+
+    DEST_DIR/T001CC/meta.json            sizes of every level
+    DEST_DIR/T001CC/overview.png         coarsest level that fits `overview` px
+    DEST_DIR/T001CC/<level>/<row>_<col>.png
+
+where level 0 is full resolution and every next level is half the size.
+"""
+import json
+import math
+import os
+
+import numpy as np
+from PIL import Image
+
+from image_store import ByteLRU
+
+TILE_SIZE = 512
+OVERVIEW_PX = 1024
+
+
+# -----------------------------
+# Offline build
+# -----------------------------
+def build_image_pyramid(src_path, dest_dir, tile_size=TILE_SIZE, overview_px=OVERVIEW_PX):
+    img = Image.open(src_path)
+    img.load()
+    os.makedirs(dest_dir, exist_ok=True)
+
+    levels = []
+    level_img = img
+    level = 0
+    while True:
+        width, height = level_img.size
+        rows = math.ceil(height / tile_size)
+        cols = math.ceil(width / tile_size)
+        level_dir = os.path.join(dest_dir, str(level))
+        os.makedirs(level_dir, exist_ok=True)
+        for r in range(rows):
+            for c in range(cols):
+                box = (c * tile_size, r * tile_size,
+                       min((c + 1) * tile_size, width), min((r + 1) * tile_size, height))
+                level_img.crop(box).save(os.path.join(level_dir, f"{r}_{c}.png"))
+        levels.append({"level": level, "scale": 2 ** level, "width": width,
+                       "height": height, "rows": rows, "cols": cols})
+
+        if max(width, height) <= overview_px:
+            level_img.save(os.path.join(dest_dir, "overview.png"))
+            break
+        level_img = level_img.reduce(2)
+        level += 1
+
+    meta = {
+        "width": img.size[0],
+        "height": img.size[1],
+        "tile_size": tile_size,
+        "overview_level": level,
+        "levels": levels,
+    }
+    with open(os.path.join(dest_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=1)
+    return meta
+
+
+def build_all(src_dir, dest_dir, tile_size=TILE_SIZE, overview_px=OVERVIEW_PX):
+    for name in sorted(os.listdir(src_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() != ".png":
+            continue
+        meta = build_image_pyramid(os.path.join(src_dir, name), os.path.join(dest_dir, stem),
+                                   tile_size=tile_size, overview_px=overview_px)
+        print(f"{name}: {meta['width']}x{meta['height']}, {len(meta['levels'])} levels")
+
+
+# -----------------------------
+# Reading the pyramid
+# -----------------------------
+class PyramidStore:
+    """
+    Serves overview images and stitched high-resolution regions of a
+    pre-built pyramid. Decoded tiles are kept in a byte-bounded LRU.
+    """
+
+    def __init__(self, root, max_bytes=None):
+        self.root = root
+        self._meta = {}
+        self._tiles = ByteLRU(max_bytes, sizeof=lambda tile: tile.nbytes)
+
+    def _image_dir(self, case_id, view):
+        return os.path.join(self.root, f"T{int(case_id):03d}{view}")
+
+    def meta(self, case_id, view):
+        key = (int(case_id), view)
+        if key not in self._meta:
+            path = os.path.join(self._image_dir(case_id, view), "meta.json")
+            if not os.path.exists(path):
+                raise FileNotFoundError(
+                    f"No image pyramid for case {case_id} {view}: {path} "
+                    f"(build it with `python image_pyramid.py`)")
+            with open(path) as f:
+                self._meta[key] = json.load(f)
+        return self._meta[key]
+
+    def overview(self, case_id, view):
+        """Coarsest level as an array, plus its scale relative to full resolution."""
+        meta = self.meta(case_id, view)
+        path = os.path.join(self._image_dir(case_id, view), "overview.png")
+        return np.asarray(Image.open(path)), 2 ** meta["overview_level"]
+
+    def _tile(self, case_id, view, level, row, col):
+        key = (int(case_id), view, level, row, col)
+        tile = self._tiles.get(key)
+        if tile is None:
+            path = os.path.join(self._image_dir(case_id, view), str(level), f"{row}_{col}.png")
+            tile = np.asarray(Image.open(path))
+            tile = self._tiles.put(key, tile)
+        return tile
+
+    def stats(self):
+        return self._tiles.stats()
+
+    def region(self, case_id, view, x_range, y_range, target_px):
+        """
+        Stitch the tiles covering a region given in full-resolution pixels,
+        at the coarsest level that still has ~`target_px` pixels across the
+        region's width.
+
+        Returns (array, scale, x_origin, y_origin) with the origin in
+        full-resolution pixels, or None if the overview is already detailed
+        enough for this region.
+        """
+        meta = self.meta(case_id, view)
+        x0, x1 = sorted(x_range)
+        y0, y1 = sorted(y_range)
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, meta["width"]), min(y1, meta["height"])
+        if x1 <= x0 or y1 <= y0:
+            return None
+
+        level = int(math.floor(math.log2(max((x1 - x0) / target_px, 1))))
+        if level >= meta["overview_level"]:
+            return None
+        info = meta["levels"][level]
+        scale = info["scale"]
+        ts = meta["tile_size"]
+
+        # region in this level's pixels
+        lx0, ly0 = int(x0 // scale), int(y0 // scale)
+        lx1 = min(int(math.ceil(x1 / scale)), info["width"])
+        ly1 = min(int(math.ceil(y1 / scale)), info["height"])
+
+        rows = range(ly0 // ts, (ly1 - 1) // ts + 1)
+        cols = range(lx0 // ts, (lx1 - 1) // ts + 1)
+        stitched = np.vstack([
+            np.hstack([self._tile(case_id, view, level, r, c) for c in cols])
+            for r in rows
+        ])
+        oy, ox = rows[0] * ts, cols[0] * ts
+        crop = stitched[ly0 - oy:ly1 - oy, lx0 - ox:lx1 - ox]
+        return crop, scale, lx0 * scale, ly0 * scale
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the image pyramid of all case images.")
+    parser.add_argument("src", nargs="?", default="images/testing_cases")
+    parser.add_argument("dest", nargs="?", default="images/pyramid")
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE)
+    parser.add_argument("--overview", type=int, default=OVERVIEW_PX,
+                        help="largest side (px) of the level shown on first paint")
+    args = parser.parse_args()
+    build_all(args.src, args.dest, tile_size=args.tile_size, overview_px=args.overview)
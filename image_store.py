@@ -0,0 +1,198 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import metrics
+
+VIEWS = ("CC", "ML")
+
+
+def case_image_path(base_path, case_id, view):
+    """
+    Path of one view of a case, e.g. case_id = 1, view = "CC"
+    -> images/testing_cases/T001CC.png
+    """
+    return os.path.join(base_path, f"T{int(case_id):03d}{view}.png")
+
+
+# -----------------------------
+# Byte-bounded LRU
+# -----------------------------
+class ByteLRU:
+    """
+    Thread-safe LRU mapping that evicts least-recently-used entries once
+    the summed size of the values exceeds `max_bytes` (None = unbounded).
+    `sizeof` tells how many bytes a value accounts for.
+    """
+
+    def __init__(self, max_bytes=None, sizeof=len):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key):
+        """Cached value or None, without counting a hit or miss or touching the LRU order."""
+        with self._lock:
+            return self._items.get(key)
+
+    def put(self, key, value):
+        """Store `value` unless another thread got there first; returns the cached value."""
+        with self._lock:
+            if key in self._items:
+                return self._items[key]
+            self._items[key] = value
+            self.nbytes += self.sizeof(value)
+            # always keep the newest entry, even if it alone is over budget
+            while (self.max_bytes is not None and self.nbytes > self.max_bytes
+                   and len(self._items) > 1):
+                _, old = self._items.popitem(last=False)
+                self.nbytes -= self.sizeof(old)
+                self.evictions += 1
+            return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# -----------------------------
+# Decoded image store
+# -----------------------------
+def file_digest(path):
+    """Content key of an image file: the same bytes give the same key wherever they are."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:20]
+
+
+class ImageStore:
+    """
+    Keeps decoded images in memory so that case navigation does not touch
+    the disk once a case has been seen (or warmed at startup).
+
+    Entries are keyed by the digest of their file (`key(path)`), so a study
+    that reuses the images of another, even as copies in another
+    directory, shares their decoded arrays and everything built from
+    them. Entries are evicted least-recently-used first once the total
+    size of the cached arrays exceeds `max_bytes` (None means unbounded).
+
+    With a `pack` (image_pack.ImagePack) images come from its memory map
+    instead and nothing is decoded or cached here.
+    """
+
+    def __init__(self, max_bytes=None, pack=None):
+        self.pack = pack
+        self._cache = ByteLRU(max_bytes, sizeof=lambda img: img.nbytes)
+        self._keys = {}     # path -> key
+        self._paths = {}    # key -> a path with that content
+        self._lock = threading.Lock()
+
+    def key(self, path):
+        """Content key of the image at `path` (hashed once per path)."""
+        path = os.path.normpath(path)
+        with self._lock:
+            key = self._keys.get(path)
+        if key is not None:
+            return key
+        if self.pack is not None:
+            key = self.pack.key_for(path)
+            if key is None:
+                raise FileNotFoundError(f"Image pack {self.pack.root} has no image {path}")
+        elif not os.path.exists(path):
+            raise FileNotFoundError(f"Cannot find image: {path}")
+        else:
+            key = file_digest(path)
+        with self._lock:
+            self._keys[path] = key
+            self._paths.setdefault(key, path)
+        return key
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._paths
+
+    @metrics.timed("image_store_get")
+    def get(self, key):
+        if self.pack is not None:
+            return self.pack.get(key)
+        img = self._cache.get(key)
+        if img is not None:
+            return img
+
+        with self._lock:
+            path = self._paths.get(key)
+        if path is None:
+            raise FileNotFoundError(f"Unknown image {key}")
+        # decode outside the lock so other images are not blocked on disk
+        from skimage import io     # slow import, deferred to the first decode
+        img = io.imread(path)
+        img.setflags(write=False)   # shared between requests, never modify
+        return self._cache.put(key, img)
+
+    def stats(self):
+        if self.pack is not None:
+            return self.pack.stats()
+        return self._cache.stats()
+
+
+class CaseImages:
+    """
+    The case views of one image directory (T001CC.png, T001ML.png, ...) in
+    a shared ImageStore.
+    """
+
+    def __init__(self, store, base_path):
+        self.store = store
+        self.base_path = base_path
+
+    def path(self, case_id, view):
+        return case_image_path(self.base_path, case_id, view)
+
+    def key(self, case_id, view):
+        path = self.path(case_id, view)
+        try:
+            return self.store.key(path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Cannot find {view} image for case {case_id}: {path}") from None
+
+    def get(self, case_id, view):
+        return self.store.get(self.key(case_id, view))
+
+    def warm(self, case_ids):
+        """
+        Decode every view of the given cases up front. Missing files are
+        skipped here and reported, they still raise when requested.
+        """
+        missing = []
+        for case_id in case_ids:
+            for view in VIEWS:
+                try:
+                    self.get(case_id, view)
+                except FileNotFoundError as e:
+                    missing.append(str(e))
+        return missing
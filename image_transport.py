@@ -0,0 +1,130 @@
+"""
+Encoding of case images for the browser.
+
+`raw` (the default) ships the pixel array inside the figure, as
+px.imshow does: a heatmap in the plasma colour scale, with a colour bar
+and the pixel value on hover. The other modes ship a compressed image,
+shown as grayscale pixels without colour bar or hover values:
+  png         lossless, as a data URI in a plotly Image trace
+  jpeg, webp  lossy, IMAGE_QUALITY controls size vs. fidelity; meant for
+              non-diagnostic previews only
+  url         lossless PNG too, but referenced by URL and fetched from a
+              cacheable image route instead of riding in the figure
+              (drawn as a layout image, Image traces only take data URIs)
+
+Run `python image_transport.py [case_id ...]` to compare figure payload
+sizes and encode times of every mode on real case images.
+"""
+import base64
+import hashlib
+import io as _io
+
+import numpy as np
+from PIL import Image
+
+import metrics
+from image_store import ByteLRU
+
+TRANSPORTS = ("raw", "png", "jpeg", "webp", "url")
+MIME_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+def to_uint8(image):
+    """8-bit version of an image; other dtypes are min-max rescaled like px.imshow does."""
+    image = np.asarray(image)
+    if image.dtype == np.uint8:
+        return image
+    lo, hi = float(image.min()), float(image.max())
+    scale = 255.0 / (hi - lo) if hi > lo else 0.0
+    return ((image - lo) * scale).astype(np.uint8)
+
+
+def encode_image(image, fmt, quality=85):
+    """Compress an image array to PNG/JPEG/WebP bytes."""
+    pil_img = Image.fromarray(to_uint8(image))
+    buf = _io.BytesIO()
+    if fmt == "png":
+        pil_img.save(buf, format="PNG", compress_level=6)
+    elif fmt == "jpeg":
+        if pil_img.mode not in ("L", "RGB"):
+            pil_img = pil_img.convert("RGB")
+        pil_img.save(buf, format="JPEG", quality=quality)
+    elif fmt == "webp":
+        pil_img.save(buf, format="WEBP", quality=quality)
+    else:
+        raise ValueError(f"Unknown image format: {fmt}")
+    return buf.getvalue()
+
+
+def image_data_uri(image, fmt, quality=85):
+    encoded = base64.b64encode(encode_image(image, fmt, quality)).decode("ascii")
+    return f"data:{MIME_TYPES[fmt]};base64,{encoded}"
+
+
+# -----------------------------
+# Encoded images for the image route
+# -----------------------------
+class EncodedImageCache:
+    """
+    Encoded bytes and content-hash ETag of each image key (see
+    ImageStore.key), for serving case images over HTTP. `get_image(key)`
+    returns the image array on a miss; entries live in a byte-bounded LRU.
+    """
+
+    def __init__(self, get_image, fmt="png", quality=85, max_bytes=None):
+        self.fmt = fmt
+        self.quality = quality
+        self.mime_type = MIME_TYPES[fmt]
+        self._get_image = get_image
+        self._cache = ByteLRU(max_bytes, sizeof=lambda entry: len(entry[0]))
+
+    @metrics.timed("encoded_image_get")
+    def get(self, key):
+        """(bytes, etag) of one encoded image."""
+        entry = self._cache.get(key)
+        if entry is None:
+            data = encode_image(self._get_image(key), self.fmt, self.quality)
+            entry = self._cache.put(key, (data, hashlib.sha1(data).hexdigest()[:20]))
+        return entry
+
+    def stats(self):
+        return self._cache.stats()
+
+
+# -----------------------------
+# Payload size comparison
+# -----------------------------
+def compare_payloads(image, quality=85):
+    """
+    Serialized figure size (bytes) and build time (s) of one image for
+    every transport mode.
+    """
+    import time
+    import plotly.io as pio
+    from testing_app import create_image_fig
+
+    results = {}
+    for transport in TRANSPORTS:
+        if transport == "url":
+            continue    # the image bytes are not part of the figure
+        start = time.perf_counter()
+        fig_json = pio.to_json(create_image_fig(image, transport=transport, quality=quality),
+                               validate=False)
+        results[transport] = (len(fig_json), time.perf_counter() - start)
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+    from testing_app import studies, IMAGE_QUALITY
+
+    case_ids = sys.argv[1:] or ["1"]
+    for case_id in case_ids:
+        for view in ("CC", "ML"):
+            image = studies.default.images.get(case_id, view)
+            print(f"case {case_id} {view}: shape={image.shape} dtype={image.dtype}")
+            results = compare_payloads(image, quality=IMAGE_QUALITY)
+            raw_size = results["raw"][0]
+            for transport, (size, seconds) in results.items():
+                print(f"  {transport:>5}: {size / 1024:10.1f} KiB "
+                      f"({size / raw_size:6.1%} of raw)  {seconds * 1000:7.1f} ms")
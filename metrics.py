@@ -0,0 +1,110 @@
+"""
+In-process metrics, exposed in the Prometheus text format on /metrics.
+
+  timed(name)          decorator recording the latency of a function
+  observe_payload()    records the size of a Dash callback response
+  add_collector(fn)    registers a function returning extra samples
+                       (e.g. cache counters) when /metrics is scraped
+
+Each process keeps its own numbers; with several workers every scrape
+reports the worker that served it (the `pid` label tells them apart).
+"""
+import functools
+import os
+import threading
+import time
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PAYLOAD_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7)
+
+
+def escape_label(value):
+    """Label value as it must appear between the quotes of the text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, label):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label = label
+        self._series = {}   # label value -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self, pid):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for label_value, series in items:
+            labels = f'{self.label}="{escape_label(label_value)}",pid="{pid}"'
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound:g}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {series[-1]}")
+        return lines
+
+
+latency = Histogram("mammo_function_seconds",
+                    "Latency of Dash callbacks and helpers.", LATENCY_BUCKETS, "function")
+payload = Histogram("mammo_callback_response_bytes",
+                    "Size of Dash callback responses.", PAYLOAD_BUCKETS, "callback")
+_collectors = []
+
+
+def timed(name):
+    """Record the latency of every call to the decorated function under `name`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                latency.observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def observe_payload(callback, nbytes):
+    payload.observe(callback, nbytes)
+
+
+def add_collector(collect):
+    """
+    `collect()` returns a list of (metric name, type, help, {label: value},
+    value) samples, e.g. ("mammo_cache_hits_total", "counter", "...",
+    {"cache": "images"}, 12).
+    """
+    _collectors.append(collect)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    pid = os.getpid()
+    lines = latency.render(pid) + payload.render(pid)
+    # samples of one metric must be listed together
+    families = {}
+    for collect in _collectors:
+        for name, kind, help_text, labels, value in collect():
+            family = families.setdefault(name, (kind, help_text, []))
+            family[2].append((labels, value))
+    for name, (kind, help_text, samples) in families.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_str = ",".join(f'{k}="{escape_label(v)}"' for k, v in {**labels, "pid": pid}.items())
+            lines.append(f"{name}{{{label_str}}} {value}")
+    return "\n".join(lines) + "\n"
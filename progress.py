@@ -0,0 +1,52 @@
+import threading
+
+
+class ProgressRegistry:
+    """
+    Completed cases per user, kept in memory.
+
+    Built from the storage backend once at startup and updated by every
+    submission. Before a user's progress is read, rows that reached storage
+    since the last look (e.g. written by another worker process) are merged
+    in incrementally, so resume lookups never re-read a user's full history.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._completed = {}    # user_id -> set of completed case ids (int)
+        self._last = {}         # user_id -> highest completed case id
+        self._cursors = {}      # user_id -> storage position already merged
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Build the registry from every user in storage."""
+        user_ids = self.storage.user_ids()
+        for user_id in user_ids:
+            self._sync(user_id)
+        return len(user_ids)
+
+    def _sync(self, user_id):
+        cases, cursor = self.storage.user_progress(user_id, self._cursors.get(user_id, 0))
+        with self._lock:
+            self._cursors[user_id] = max(cursor, self._cursors.get(user_id, 0))
+            self._merge(user_id, cases)
+
+    def _merge(self, user_id, cases):
+        completed = self._completed.setdefault(user_id, set())
+        completed.update(cases)
+        if completed:
+            self._last[user_id] = max(completed)
+
+    def record(self, user_id, case_id):
+        with self._lock:
+            self._merge(user_id, (int(case_id),))
+
+    def last_completed(self, user_id):
+        """Highest completed case id of a user, None if they have not submitted any."""
+        self._sync(user_id)
+        return self._last.get(user_id)
+
+    def completed(self, user_id):
+        self._sync(user_id)
+        with self._lock:
+            return frozenset(self._completed.get(user_id, ()))
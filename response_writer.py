@@ -0,0 +1,215 @@
+"""
+Background writer for submission rows.
+
+Request threads append the row to a write-ahead journal, wait until it is
+on disk (one fsync covers the rows of all threads waiting at the time) and
+queue it; a single writer thread per process hands queued rows to the
+storage backend in batches (see storage.py) and then clears the journal.
+Rows that were journaled but not yet stored when a process died are
+replayed by `recover_journals()` at the next start, and by the writer
+thread of each process when it starts (e.g. a worker replacing a killed
+one). Rows are written at least once: a replay can repeat a row whose
+write finished but whose journal entry was not yet cleared.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:     # Windows: single-process use only
+    fcntl = None
+
+JOURNAL_PREFIX = ".journal-"
+
+
+def _lock(f, exclusive=True, blocking=True):
+    if fcntl is None:
+        return True
+    flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+    if not blocking:
+        flags |= fcntl.LOCK_NB
+    try:
+        fcntl.flock(f.fileno(), flags)
+        return True
+    except BlockingIOError:
+        return False
+
+
+def recover_journals(journal_dir, write_batch, skip=None):
+    """
+    Replay journals left behind by writers that are no longer running
+    through `write_batch(rows)`, except the journal at `skip` (the
+    caller's own). Returns the number of replayed rows.
+    """
+    replayed = 0
+    for path in glob.glob(os.path.join(journal_dir, f"{JOURNAL_PREFIX}*.jsonl")):
+        if path == skip:
+            continue
+        try:
+            journal = open(path, "r+")
+        except FileNotFoundError:
+            continue        # replayed by another process meanwhile
+        with journal:
+            # a live writer keeps its journal locked
+            if not _lock(journal, blocking=False):
+                continue
+            if os.fstat(journal.fileno()).st_nlink == 0:
+                continue    # replayed and removed while we waited to open it
+            rows = []
+            for line in journal:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    break   # torn last line from a crash mid-write
+            if rows:
+                write_batch(rows)
+                replayed += len(rows)
+            if fcntl is not None:
+                # removed while still locked, so no other process replays it again
+                os.remove(path)
+        if fcntl is None:
+            os.remove(path)     # Windows cannot remove an open file
+    return replayed
+
+
+class ResponseWriter:
+    """
+    Queue of rows drained by one writer thread into `write_batch(rows)`,
+    every `flush_interval` seconds or as soon as `batch_size` rows are
+    waiting. The thread is started on first use in each process, so the
+    writer survives forking servers.
+    """
+
+    def __init__(self, journal_dir, write_batch, flush_interval=0.2, batch_size=100):
+        self.journal_dir = journal_dir
+        self.write_batch = write_batch
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._journal_lock = threading.Lock()
+        self._journal = None
+        self._journal_path = None
+        # rows appended to the journal, and how many of them are fsynced
+        self._sync_lock = threading.Lock()
+        self._appended = 0
+        self._synced = 0
+        self._pid = None
+        self._thread = None
+        self.rows_written = 0
+        self.batches = 0
+        self.errors = 0
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._journal_lock:
+            if self._pid == os.getpid():
+                return
+            if self._journal is not None:
+                # inherited from the parent process, which still owns it
+                self._journal.close()
+            os.makedirs(self.journal_dir, exist_ok=True)
+            # the pid of a dead worker can be reused: the suffix keeps its
+            # journal apart until it is replayed
+            path = os.path.join(self.journal_dir,
+                                f"{JOURNAL_PREFIX}{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl")
+            self._journal = open(path, "a")
+            self._journal_path = path
+            _lock(self._journal)
+            self._queue = queue.Queue()
+            self._appended = self._synced = 0
+            self._thread = threading.Thread(target=self._run, name="response-writer", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def submit(self, row):
+        """Journal and queue one row; returns once it is journaled on disk, not stored."""
+        self._ensure_started()
+        with self._journal_lock:
+            self._journal.write(json.dumps(row) + "\n")
+            self._journal.flush()
+            self._queue.put(row)
+            self._appended += 1
+            appended = self._appended
+        self._sync_journal(appended)
+
+    def _sync_journal(self, appended):
+        """Group commit: fsync the journal unless a concurrent fsync covered row `appended`."""
+        with self._sync_lock:
+            if self._synced >= appended:
+                return
+            with self._journal_lock:
+                target = self._appended
+            os.fsync(self._journal.fileno())
+            self._synced = target
+
+    def _take_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _recover(self):
+        """Replay the journals of writers that died since this process started."""
+        try:
+            recovered = recover_journals(self.journal_dir, self.write_batch, skip=self._journal_path)
+        except Exception as e:
+            # the journal stays on disk and is replayed at the next start
+            logger.error("journal recovery failed: %s", e)
+            return
+        if recovered:
+            logger.warning("journal recovered dir=%s rows=%d", self.journal_dir, recovered)
+
+    def _run(self):
+        self._recover()
+        while True:
+            batch = self._take_batch()
+            delay = 0.1
+            while True:
+                try:
+                    self.write_batch(batch)
+                    break
+                except Exception as e:
+                    # keep the batch (and its journal entries) and retry
+                    self.errors += 1
+                    logger.error("response write failed, retrying: %s", e)
+                    time.sleep(delay)
+                    delay = min(delay * 2, 5.0)
+            self.rows_written += len(batch)
+            self.batches += 1
+            with self._journal_lock:
+                if self._queue.unfinished_tasks == len(batch):
+                    # everything journaled so far is on disk
+                    self._journal.truncate(0)
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until every queued row has been written."""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "rows_written": self.rows_written,
+            "batches": self.batches,
+            "errors": self.errors,
+        }
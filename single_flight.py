@@ -0,0 +1,65 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time: callers asking for a
+    key that is already being computed wait for that computation and get
+    its result (or exception) instead of starting their own.
+
+    Computations run in a pool of `max_workers` threads, so a burst of
+    different keys cannot start more than that many at once. Do not call
+    `do()` from inside a computation of the same SingleFlight: with a full
+    pool it would wait forever.
+    """
+
+    def __init__(self, max_workers=4, name="single-flight"):
+        self.max_workers = max_workers
+        self.name = name
+        self._pool = None
+        self._pid = None
+        self._inflight = {}     # key -> Future of the running computation
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    def _executor(self):
+        # pool threads (and their pending work) do not survive a fork
+        if self._pid != os.getpid():
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix=self.name)
+            self._inflight = {}
+            self._pid = os.getpid()
+        return self._pool
+
+    def do(self, key, func, *args):
+        """Result of `func(*args)`, shared with concurrent callers of the same key."""
+        with self._lock:
+            self.calls += 1
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._executor().submit(self._run, key, func, args)
+                self._inflight[key] = future
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        return future.result()
+
+    def _run(self, key, func, args):
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._inflight),
+            }
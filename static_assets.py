@@ -0,0 +1,52 @@
+"""
+Stylesheets of the app, served from assets/vendor/ when a local copy
+exists and from their CDN otherwise.
+
+Download the local copies once on each machine that serves the app
+(needs internet access; nothing is downloaded at startup):
+
+    python static_assets.py
+
+Dash serves every .css file under assets/ itself, in file name order,
+so the theme has to sort before the dbc overrides.
+"""
+import logging
+import os
+import urllib.request
+
+import dash_bootstrap_components as dbc
+
+logger = logging.getLogger(__name__)
+
+VENDOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "vendor")
+# local file name -> CDN url
+STYLESHEETS = {
+    "1-bootstrap-cyborg.min.css": dbc.themes.CYBORG,
+    "2-dbc.min.css": "https://cdn.jsdelivr.net/gh/AnnMarieW/dash-bootstrap-templates@V1.0.4/dbc.min.css",
+}
+
+
+def external_stylesheets(vendor_dir=VENDOR_DIR):
+    """CDN urls of the stylesheets that have no local copy."""
+    missing = [name for name in STYLESHEETS if not os.path.exists(os.path.join(vendor_dir, name))]
+    if missing:
+        # without them the reading screen is unstyled on machines that
+        # cannot reach the CDN
+        logger.warning("stylesheets %s not in %s, browsers load them from the CDN; "
+                       "run `python static_assets.py` to serve them locally",
+                       ", ".join(missing), vendor_dir)
+    return [STYLESHEETS[name] for name in missing]
+
+
+def download(vendor_dir=VENDOR_DIR):
+    os.makedirs(vendor_dir, exist_ok=True)
+    for name, url in STYLESHEETS.items():
+        with urllib.request.urlopen(url, timeout=30) as response:
+            data = response.read()
+        with open(os.path.join(vendor_dir, name), "wb") as f:
+            f.write(data)
+        print(f"{url} -> {name} ({len(data)} bytes)")
+
+
+if __name__ == "__main__":
+    download()
@@ -0,0 +1,220 @@
+"""
+Storage backends for reader submissions.
+
+Both backends take the same rows (RESULT_HEADER order: userID, timestamp,
+case_id, patient_id, pathology, birads, confidence):
+  CsvStorage     one output/<user>_testing.csv per reader (the original layout)
+  SqliteStorage  one SQLite database in WAL mode, indexed on user and case
+
+Import existing CSV results into SQLite with
+
+    python storage.py import-csv [--output-dir output] [--db output/responses.db]
+"""
+import csv
+import glob
+import io
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:     # Windows: single-process use only
+    fcntl = None
+
+RESULT_HEADER = [
+    "userID",
+    "timestamp",
+    "case_id",
+    "patient_id",
+    "pathology",
+    "birads",
+    "confidence",
+]
+RESULTS_SUFFIX = "_testing.csv"
+
+
+def append_csv_rows(filename, rows, header=RESULT_HEADER):
+    """Append rows to a CSV under an exclusive lock, writing `header` first if the file is new."""
+    with open(filename, "a", newline="") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if header is not None and f.tell() == 0:
+            writer.writerow(header)
+        writer.writerows(rows)
+        f.write(buf.getvalue())
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_csv_results(filename):
+    """Rows of one result CSV as dicts; unreadable files give no rows."""
+    try:
+        with open(filename, newline="") as f:
+            return list(csv.DictReader(f))
+    except OSError as e:
+        logger.error("cannot read results file %s: %s", filename, e)
+        return []
+
+
+# -----------------------------
+# CSV backend
+# -----------------------------
+class CsvStorage:
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+
+    def results_file(self, user_id):
+        return os.path.join(self.output_dir, f"{user_id}{RESULTS_SUFFIX}")
+
+    def register_user(self, user_id):
+        # Only create file with header if it doesn't already exist
+        os.makedirs(self.output_dir, exist_ok=True)
+        filename = self.results_file(user_id)
+        if not os.path.exists(filename):
+            with open(filename, "w", newline="") as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow(RESULT_HEADER)
+
+    def append_rows(self, rows):
+        by_user = {}
+        for row in rows:
+            by_user.setdefault(row[0], []).append(row)
+        for user_id, user_rows in by_user.items():
+            append_csv_rows(self.results_file(user_id), user_rows)
+
+    def user_ids(self):
+        pattern = os.path.join(self.output_dir, f"*{RESULTS_SUFFIX}")
+        return [os.path.basename(f)[:-len(RESULTS_SUFFIX)] for f in glob.glob(pattern)]
+
+    def user_progress(self, user_id, cursor=0):
+        """
+        Case ids the user submitted after `cursor` (a byte offset into their
+        CSV), and the new cursor. Only complete lines are consumed, so a
+        row being appended by another process is picked up next time.
+        """
+        try:
+            with open(self.results_file(user_id), "rb") as f:
+                f.seek(cursor)
+                data = f.read()
+        except OSError:
+            return set(), cursor
+        end = data.rfind(b"\n") + 1
+        cases = set()
+        for row in csv.reader(data[:end].decode("utf-8").splitlines()):
+            try:
+                cases.add(int(row[2]))
+            except (IndexError, ValueError):
+                continue    # header or malformed row
+        return cases, cursor + end
+
+
+# -----------------------------
+# SQLite backend
+# -----------------------------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id    TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS responses (
+    user_id    TEXT NOT NULL,
+    timestamp  TEXT NOT NULL,
+    case_id    INTEGER NOT NULL,
+    patient_id TEXT,
+    pathology  TEXT,
+    birads     TEXT,
+    confidence TEXT,
+    UNIQUE (user_id, case_id, timestamp)
+);
+CREATE INDEX IF NOT EXISTS responses_user_case ON responses (user_id, case_id);
+CREATE INDEX IF NOT EXISTS responses_case ON responses (case_id);
+"""
+
+
+class SqliteStorage:
+    """
+    Submissions in one SQLite database. WAL mode lets the writer thread of
+    every worker process append while others read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+
+    def _conn(self):
+        # one connection per thread (and per process after a fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            # FULL: a commit is on disk when append_rows returns, as the
+            # response writer clears its journal right after (NORMAL under
+            # WAL can lose the last commits on power failure)
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def register_user(self, user_id):
+        with self._conn() as conn:
+            conn.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (user_id,))
+
+    def append_rows(self, rows):
+        with self._conn() as conn:
+            conn.executemany("INSERT OR IGNORE INTO users (user_id) VALUES (?)",
+                             {(row[0],) for row in rows})
+            conn.executemany(
+                "INSERT OR IGNORE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [tuple(row) for row in rows],
+            )
+
+    def user_ids(self):
+        return [user_id for (user_id,) in self._conn().execute("SELECT user_id FROM users")]
+
+    def user_progress(self, user_id, cursor=0):
+        """Case ids the user submitted after row `cursor`, and the new cursor."""
+        cases = set()
+        for rowid, case_id in self._conn().execute(
+                "SELECT rowid, case_id FROM responses WHERE user_id = ? AND rowid > ?",
+                (user_id, cursor)):
+            cases.add(case_id)
+            cursor = max(cursor, rowid)
+        return cases, cursor
+
+
+def import_csv_results(output_dir, storage):
+    """
+    Copy every output/<user>_testing.csv into `storage`. Rows already
+    present are skipped, so the import can be re-run.
+    """
+    imported = 0
+    for filename in sorted(glob.glob(os.path.join(output_dir, f"*{RESULTS_SUFFIX}"))):
+        storage.register_user(os.path.basename(filename)[:-len(RESULTS_SUFFIX)])
+        rows = [[row.get(col) for col in RESULT_HEADER] for row in read_csv_results(filename)]
+        rows = [row for row in rows if row[0] and row[2]]
+        storage.append_rows(rows)
+        imported += len(rows)
+        print(f"{filename}: {len(rows)} rows")
+    return imported
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Submission storage tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    import_cmd = sub.add_parser("import-csv", help="import output/*_testing.csv into SQLite")
+    import_cmd.add_argument("--output-dir", default="output")
+    import_cmd.add_argument("--db", default=os.path.join("output", "responses.db"))
+    args = parser.parse_args()
+
+    if args.command == "import-csv":
+        total = import_csv_results(args.output_dir, SqliteStorage(args.db))
+        print(f"Imported {total} rows into {args.db}")
@@ -0,0 +1,94 @@
+"""
+Several reading studies served by one app, each under its own URL path:
+
+    STUDIES_FILE=studies.json python testing_app.py
+
+where studies.json lists them, e.g.
+
+    [
+      {"name": "testing", "path": "/", "cases": "testing_cases.csv",
+       "images": "images/testing_cases", "output": "output"},
+      {"name": "learning", "path": "/learning", "cases": "learning_cases.csv",
+       "images": "images/learning_cases", "output": "output/learning",
+       "feedback": true}
+    ]
+
+A study has its own case table, results (`output`, plus `sqlite`, default
+<output>/responses.db, with STORAGE_BACKEND=sqlite) and pyramid tiles
+(`pyramid`, default <images>/pyramid), and with `feedback` readers are
+shown the correct answers after each submission. Decoded images and
+rendered figures are shared by all studies (see ImageStore), so a case
+image used by two studies is loaded and rendered once.
+
+Without STUDIES_FILE the app serves the testing study alone, at "/".
+"""
+import json
+import os
+
+from case_index import CaseIndex
+
+
+class Study:
+    def __init__(self, name, path="/", cases="testing_cases.csv", images="images/testing_cases",
+                 output="output", pyramid=None, sqlite=None, feedback=False):
+        self.name = name
+        self.path = "/" + path.strip("/") if path.strip("/") else "/"
+        self.cases_file = cases
+        self.image_dir = images
+        self.output_dir = output
+        self.pyramid_dir = pyramid or os.path.join(images, "pyramid")
+        self.sqlite_path = sqlite or os.path.join(output, "responses.db")
+        self.feedback = feedback
+        # case_id -> record / position / next case, built once
+        self.case_index = CaseIndex.from_csv(cases)
+        # opened by testing_app: storage, response_writer, progress, images, pyramid
+        self.storage = None
+        self.response_writer = None
+        self.progress = None
+        self.images = None
+        self.pyramid = None
+
+    def matches(self, pathname):
+        return self.path == "/" or pathname == self.path or pathname.startswith(self.path + "/")
+
+    def __repr__(self):
+        return f"Study({self.name!r}, path={self.path!r}, cases={len(self.case_index.ids)})"
+
+
+class StudyRegistry:
+    """The studies of the app, looked up by the URL path a reader opened."""
+
+    def __init__(self, studies):
+        self.studies = list(studies)
+        if not self.studies:
+            raise ValueError("No studies configured")
+        for attr in ("name", "path", "output_dir"):
+            values = [os.path.normpath(getattr(s, attr)) for s in self.studies]
+            duplicates = sorted({v for v in values if values.count(v) > 1})
+            if duplicates:
+                # results of two studies in one directory would be mixed up
+                raise ValueError(f"Studies must have distinct {attr}s, shared: {', '.join(duplicates)}")
+        self.by_name = {s.name: s for s in self.studies}
+        # a study at "/" catches every path no other study claims
+        self.default = next((s for s in self.studies if s.path == "/"), self.studies[0])
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls(Study(**entry) for entry in json.load(f))
+
+    def __iter__(self):
+        return iter(self.studies)
+
+    def __len__(self):
+        return len(self.studies)
+
+    def for_path(self, pathname):
+        """Study served at a URL path (longest matching prefix), the default one otherwise."""
+        if not pathname:
+            return self.default
+        pathname = "/" + pathname.strip("/")
+        matching = [s for s in self.studies if s.matches(pathname)]
+        if not matching:
+            return self.default
+        return max(matching, key=lambda s: len(s.path))
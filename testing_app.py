@@ -1,102 +1,193 @@
 import dash
 from dash import dcc, html
 import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output, State
-import pandas as pd
-import plotly.express as px
-from skimage import io
+from dash.dependencies import Input, Output, State, ClientsideFunction
+from dash import Patch
+from flask import Response, g, jsonify, request
+import plotly.graph_objects as go
 import os
-import csv
+import logging
 from datetime import datetime
 
+from image_store import CaseImages, ImageStore, VIEWS, case_image_path
+from image_pack import ImagePack
+from figure_cache import FigureCache
+from image_transport import EncodedImageCache, image_data_uri
+from image_pyramid import PyramidStore
+from studies import Study, StudyRegistry
+from valid_ids import ValidIdSet
+from progress import ProgressRegistry
+from response_writer import ResponseWriter, recover_journals
+from storage import CsvStorage, SqliteStorage, append_csv_rows
+from static_assets import external_stylesheets
+import metrics
+from admission import AdmissionController
+
+# DEBUG | INFO | WARNING ...
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(
+    level=LOG_LEVEL,
+    format="%(asctime)s %(levelname)s %(name)s %(message)s",
+)
+logger = logging.getLogger("testing_app")
+
+# development server settings (python testing_app.py); production runs
+# through wsgi.py instead, see README
+DEBUG = os.environ.get("DASH_DEBUG", "1") == "1"
+HOST = os.environ.get("HOST", "127.0.0.1")
+PORT = int(os.environ.get("PORT", "8053"))
+
 OUTPUT_DIR = "output"
+CASES_FILE = "testing_cases.csv"
+# several studies in one app, each under its own URL path (see studies.py);
+# without it the app serves the testing study alone
+STUDIES_FILE = os.environ.get("STUDIES_FILE")
+VALID_IDS_FILE = "valid_ids.csv"
+# client-measured transition times, written to <study output>/<user>_telemetry.csv
+CLIENT_TELEMETRY = os.environ.get("CLIENT_TELEMETRY", "1") == "1"
+TELEMETRY_HEADER = [
+    "userID",
+    "received",
+    "client_time",
+    "kind",
+    "from_case_id",
+    "case_id",
+    "click_to_case_ms",
+    "click_to_render_ms",
+]
+TELEMETRY_MAX_BATCH = 100
+
+# where submissions are stored: csv (one file per user) | sqlite
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "csv")
+SQLITE_PATH = os.environ.get("SQLITE_PATH", os.path.join(OUTPUT_DIR, "responses.db"))
+# submissions are written by a background thread in batches
+RESPONSE_FLUSH_INTERVAL = float(os.environ.get("RESPONSE_FLUSH_INTERVAL", "0.2"))
+RESPONSE_BATCH_SIZE = int(os.environ.get("RESPONSE_BATCH_SIZE", "100"))
+IMAGE_DIR = "images/testing_cases"
+# where case images come from: png (decode IMAGE_DIR on demand)
+# pack: memory-mapped images/pack, checked at startup
+#       (build it first with `python image_pack.py`)
+IMAGE_SOURCE = os.environ.get("IMAGE_SOURCE", "png")
+IMAGE_PACK_DIR = "images/pack"
+# verify the checksum of every packed image at startup
+IMAGE_PACK_VERIFY = os.environ.get("IMAGE_PACK_VERIFY", "1") == "1"
+# memory budget for decoded case images, 0 = unbounded
+IMAGE_CACHE_MB = int(os.environ.get("IMAGE_CACHE_MB", "2048"))
+# memory budget for serialized case figures, 0 = unbounded
+FIGURE_CACHE_MB = int(os.environ.get("FIGURE_CACHE_MB", "2048"))
+# figures rendered at once on cache misses; concurrent misses on the same
+# case view share one render
+RENDER_THREADS = int(os.environ.get("RENDER_THREADS", "4"))
+# how case images are sent to the browser: raw | png | jpeg | webp | url
+# (see image_transport.py; raw is the colour-mapped heatmap, the others
+# show grayscale pixels; jpeg/webp are lossy, for previews only; url
+# serves lossless PNGs from IMAGE_ROUTE with HTTP caching)
+IMAGE_TRANSPORT = os.environ.get("IMAGE_TRANSPORT", "raw")
+IMAGE_QUALITY = int(os.environ.get("IMAGE_QUALITY", "85"))
+IMAGE_ROUTE = "/case-images"
+# browsers and proxies may keep a versioned image URL this long (s)
+IMAGE_MAX_AGE = int(os.environ.get("IMAGE_MAX_AGE", str(365 * 24 * 3600)))
+# full: ship the whole image per view
+# pyramid: ship a screen-sized overview and load tiles of the zoomed region
+#          (build images/pyramid first with `python image_pyramid.py`)
+IMAGE_VIEWER = os.environ.get("IMAGE_VIEWER", "full")
+# after login the browser downloads all remaining cases of the reader into
+# its own storage (assets/study_download.js), so case transitions wait only
+# for the submission; needs IMAGE_TRANSPORT=url and IMAGE_VIEWER=full
+PREDOWNLOAD = os.environ.get("PREDOWNLOAD", "0") == "1"
+PYRAMID_DIR = "images/pyramid"
+# roughly how many image pixels to send across the visible width on zoom
+PYRAMID_DETAIL_PX = int(os.environ.get("PYRAMID_DETAIL_PX", "1024"))
+# admission control per process: at most MAX_INFLIGHT_CALLBACKS case renders
+# and submits run at once, at most MAX_INFLIGHT_RENDERS of them renders, so
+# submits always find a slot; 0 turns it off. Over capacity the browser is
+# told to retry (503 + Retry-After, see assets/retry.js).
+MAX_INFLIGHT_CALLBACKS = int(os.environ.get("MAX_INFLIGHT_CALLBACKS", "8"))
+MAX_INFLIGHT_RENDERS = int(os.environ.get("MAX_INFLIGHT_RENDERS", "6"))
+# how long a submit waits for a slot before it is turned away
+SUBMIT_QUEUE_SECONDS = float(os.environ.get("SUBMIT_QUEUE_SECONDS", "5"))
+RETRY_AFTER_SECONDS = 1
+CALLBACK_KINDS = {
+    "handle_submit": "submit",
+    "display_page": "render",
+    "update_case_display": "render",
+    "prefetch_next_case": "render",
+    "send_study_payloads": "render",
+    "zoom_cc_detail": "render",
+    "zoom_ml_detail": "render",
+}
 # -----------------------------
 # 1) Load CSV data at startup
 # -----------------------------
-cases_df = pd.read_csv("testing_cases.csv")
-
-cases_df = cases_df.rename(columns={
-    "Order": "case_id",              # used as the main case identifier
-    "ID": "id",                      # used for display
-    "Age": "patient_age",
-    "Race": "patient_race",
-    "Ethnicity": "patient_ethnicity",
-    "Size (mm)": "calcification_span",
-    "Pathology": "correct_pathology",
-    "BI-RADS": "correct_BIRADS"
-})
-
-def get_case_row(case_id):
-    row = cases_df.loc[cases_df["case_id"] == int(case_id)]
-    if row.empty:
-        return None
-    return row.iloc[0]
-
-def get_next_case_id(current_case_id):
-    current_idx = cases_df.index[cases_df["case_id"] == int(current_case_id)]
-    if len(current_idx) == 0:
-        return str(cases_df["case_id"].iloc[0])
-    idx = current_idx[0]
-    next_idx = idx + 1
-    if next_idx < len(cases_df):
-        return str(cases_df["case_id"].iloc[next_idx])
-    else:
-        return str(cases_df["case_id"].iloc[0])
+if STUDIES_FILE:
+    studies = StudyRegistry.from_file(STUDIES_FILE)
+else:
+    studies = StudyRegistry([Study("testing", cases=CASES_FILE, images=IMAGE_DIR, output=OUTPUT_DIR,
+                                   pyramid=PYRAMID_DIR, sqlite=SQLITE_PATH)])
+logger.info("studies %s", list(studies))
+
+def get_case_row(study, case_id):
+    return study.case_index.get(case_id)
+
+def get_next_case_id(study, current_case_id):
+    return study.case_index.next_id(current_case_id)
+
+def get_following_case_id(study, current_case_id):
+    """Case after `current_case_id` in reading order, None after the last case."""
+    return study.case_index.following_id(current_case_id)
 
 # -----------------------------
 # Helper: resume logic per user
 # -----------------------------
-def get_start_case_for_user(user_id: str):
+def open_study(study):
+    """Storage, background writer and progress registry of one study."""
+    if STORAGE_BACKEND == "sqlite":
+        study.storage = SqliteStorage(study.sqlite_path)
+    else:
+        study.storage = CsvStorage(study.output_dir)
+
+    # rows a previous run journaled but never stored are written first
+    os.makedirs(study.output_dir, exist_ok=True)
+    recovered = recover_journals(study.output_dir, study.storage.append_rows)
+    if recovered:
+        logger.warning("journal recovered study=%s rows=%d", study.name, recovered)
+
+    study.response_writer = ResponseWriter(
+        study.output_dir,
+        metrics.timed("storage_append_rows")(study.storage.append_rows),
+        flush_interval=RESPONSE_FLUSH_INTERVAL,
+        batch_size=RESPONSE_BATCH_SIZE,
+    )
+
+    # completed cases per user, built from storage once at startup
+    study.progress = ProgressRegistry(study.storage)
+    study.progress.load()
+
+for study in studies:
+    open_study(study)
+
+def get_start_case_for_user(study, user_id: str):
     """
-    Look at <user_id>_testing.csv and decide which case_id
+    Look up the user's progress and decide which case_id
     the user should start on this session.
 
     Returns:
         str case_id to start at, or None if the user has completed all cases.
     """
-    # filename = f"{user_id}_testing.csv"
-    filename = f"output/{user_id}_testing.csv"
-    print(f"get_start_case_for_user: {user_id} -> looking for {filename}")
+    case_index = study.case_index
+    last_case = study.progress.last_completed(user_id)
+    logger.debug("resume lookup study=%s user=%s last_completed=%s", study.name, user_id, last_case)
 
-    if not os.path.exists(filename):
+    if last_case is None or case_index.get(last_case) is None:
         # Never seen this user before: start at first case
-        return str(cases_df["case_id"].iloc[0])
-
-
-    try:
-        progress_df = pd.read_csv(filename)
-    except Exception as e:
-        print("Error reading progress file:", e)
-        return str(cases_df["case_id"].iloc[0])
-
-    if progress_df.empty or "case_id" not in progress_df.columns:
-        return str(cases_df["case_id"].iloc[0])
-
-    completed_case_ids = (
-        progress_df["case_id"]
-        .dropna()
-        .astype(int)
-        .unique()
-    )
-
-    if len(completed_case_ids) == 0:
-        return str(cases_df["case_id"].iloc[0])
-
-    last_case = int(completed_case_ids.max())
-    print("Last completed case:", last_case)
-
-    current_idx = cases_df.index[cases_df["case_id"] == last_case]
-    if len(current_idx) == 0:
-        return str(cases_df["case_id"].iloc[0])
-
-    idx = current_idx[0]
+        return case_index.first_id
 
     # If they’ve already done the last case, there is nothing left
-    if idx == len(cases_df) - 1:
+    if case_index.is_last(last_case):
         return None
 
     # Otherwise, start at the next case
-    return str(cases_df["case_id"].iloc[idx + 1])
+    return case_index.following_id(last_case)
 
 # Helper mappings for display
 RACE_MAP = {
@@ -111,21 +202,59 @@ ETHNICITY_MAP = {
 }
 
 def pretty_race(code):
-    if pd.isna(code):
+    if code is None:
         return "Unknown"
     code = str(code).strip()
     return RACE_MAP.get(code, code)
 
 def pretty_ethnicity(code):
-    if pd.isna(code):
+    if code is None:
         return "Unknown"
     code = str(code).strip()
     return ETHNICITY_MAP.get(code, code)
 
+def case_labels(row):
+    """Texts of the case-id, age, race, ethnicity and span labels."""
+    return [
+        f"Case ID: {row.id}",
+        f"Patient age: {row.patient_age}",
+        f"Patient race: {pretty_race(row.patient_race)}",
+        f"Patient ethnicity: {pretty_ethnicity(row.patient_ethnicity)}",
+        f"Calcification longest span (mm): {row.calcification_span}",
+    ]
+
 # -----------------------------
 # 2) Image loading utilities
 # -----------------------------
-def load_imgs(case_id):
+image_pack = None
+if IMAGE_SOURCE == "pack":
+    # a broken case set stops the app here, not when a reader reaches the case
+    image_pack = ImagePack(IMAGE_PACK_DIR)
+    paths = [case_image_path(study.image_dir, case_id, view)
+             for study in studies for case_id in study.case_index.ids for view in VIEWS]
+    problems = image_pack.validate(paths, checksums=IMAGE_PACK_VERIFY)
+    if problems:
+        raise RuntimeError(f"Image pack {IMAGE_PACK_DIR} is not usable:\n  " + "\n  ".join(problems))
+    logger.info("image pack ok %s", image_pack.stats())
+
+if PREDOWNLOAD and (IMAGE_TRANSPORT != "url" or IMAGE_VIEWER != "full"):
+    # other modes put the pixels into the case payloads themselves
+    raise RuntimeError("PREDOWNLOAD=1 needs IMAGE_TRANSPORT=url and IMAGE_VIEWER=full")
+
+# decoded images of all studies, shared by content
+image_store = ImageStore(
+    max_bytes=IMAGE_CACHE_MB * 1024 * 1024 if IMAGE_CACHE_MB > 0 else None,
+    pack=image_pack,
+)
+
+for study in studies:
+    study.images = CaseImages(image_store, study.image_dir)
+    study.pyramid = PyramidStore(
+        study.pyramid_dir,
+        max_bytes=IMAGE_CACHE_MB * 1024 * 1024 if IMAGE_CACHE_MB > 0 else None,
+    )
+
+def load_imgs(case_id, study=None):
     """
     Load the CC and ML images for a given case ID.
 
@@ -133,39 +262,191 @@ def load_imgs(case_id):
       case_id = 1  -> images/testing_cases/T001CC.png and images/testing_cases/T001ML.png
       case_id = 2  -> images/testing_cases/T002CC.png and images/testing_cases/T002ML.png
       ...
-    where `case_id` comes from the `Order` column in testing_cases.csv.
-    """
-    base_path = "images/testing_cases"
-
-    idx = int(case_id)
-    case_str = f"T{idx:03d}"   # 1 -> "T001", 2 -> "T002", etc.
-
-    cc_path = os.path.join(base_path, f"{case_str}CC.png")
-    ml_path = os.path.join(base_path, f"{case_str}ML.png")
-
-    if not os.path.exists(cc_path):
-        raise FileNotFoundError(f"Cannot find CC image for case {case_id}: {cc_path}")
-    if not os.path.exists(ml_path):
-        raise FileNotFoundError(f"Cannot find ML image for case {case_id}: {ml_path}")
+    where `case_id` comes from the `Order` column in testing_cases.csv
+    (or the image directory and case table of `study`).
 
-    img_cc = io.imread(cc_path)
-    img_ml = io.imread(ml_path)
+    Images are decoded once and then served from `image_store`.
+    """
+    study = study or studies.default
+    img_cc = study.images.get(case_id, "CC")
+    img_ml = study.images.get(case_id, "ML")
 
     return img_cc, img_ml
 
-def create_image_fig(image):
-    fig = px.imshow(image)
+@metrics.timed("create_image_fig")
+def create_image_fig(image, transport=IMAGE_TRANSPORT, quality=IMAGE_QUALITY, source=None):
+    if transport == "raw":
+        import plotly.express as px     # pulls in pandas, only needed here
+        fig = px.imshow(image)
+    elif source is not None:
+        # image fetched by the browser from `source`, e.g. image_url(). Image
+        # traces only take data URIs, so it is a layout image on axes spanning
+        # the pixel grid (as an image trace would), with an invisible trace
+        # to make the axes
+        height, width = image.shape[:2]
+        fig = go.Figure(go.Scatter(x=[-0.5, width - 0.5], y=[-0.5, height - 0.5], mode="markers",
+                                   marker_opacity=0, hoverinfo="skip", showlegend=False))
+        fig.add_layout_image(source=source, xref="x", yref="y", x=-0.5, y=-0.5,
+                             sizex=width, sizey=height, sizing="stretch", layer="below")
+        fig.update_xaxes(range=[-0.5, width - 0.5], constrain="domain", showgrid=False, zeroline=False)
+        fig.update_yaxes(range=[height - 0.5, -0.5], constrain="domain", scaleanchor="x",
+                         showgrid=False, zeroline=False)
+    else:
+        # compressed image as a data URI instead of a numeric z array
+        fig = go.Figure(go.Image(source=image_data_uri(image, transport, quality)))
     fig.update_layout(template="plotly_dark", margin=dict(l=0, r=0, t=0, b=0))
     fig.update_xaxes(showticklabels=False).update_yaxes(showticklabels=False)
     return fig
 
+def pyramid_transport():
+    # the overview and detail images are always compressed
+    return "png" if IMAGE_TRANSPORT in ("raw", "url") else IMAGE_TRANSPORT
+
+def create_pyramid_fig(study, case_id, view):
+    """
+    Figure showing the pyramid overview of a case view, stretched to
+    full-resolution pixel coordinates, plus a hidden trace that receives
+    the high-resolution tiles of the zoomed region.
+    """
+    overview, scale = study.pyramid.overview(case_id, view)
+    fig = go.Figure([
+        go.Image(
+            source=image_data_uri(overview, pyramid_transport(), IMAGE_QUALITY),
+            x0=(scale - 1) / 2, y0=(scale - 1) / 2, dx=scale, dy=scale,
+        ),
+        go.Image(visible=False, hoverinfo="skip"),
+    ])
+    # keep the reader's zoom when the detail trace is patched in
+    fig.update_layout(template="plotly_dark", margin=dict(l=0, r=0, t=0, b=0),
+                      uirevision=f"{study.name}:{case_id}{view}")
+    fig.update_xaxes(showticklabels=False).update_yaxes(showticklabels=False)
+    return fig
+
+# encoded PNGs behind IMAGE_ROUTE (url transport)
+encoded_images = EncodedImageCache(
+    image_store.get,
+    max_bytes=FIGURE_CACHE_MB * 1024 * 1024 if FIGURE_CACHE_MB > 0 else None,
+)
+
+def image_url(key):
+    """URL of an image on the image route, versioned by its encoded content hash."""
+    _, etag = encoded_images.get(key)
+    return f"{IMAGE_ROUTE}/{key}.png?v={etag}"
+
+# figure key -> (study, case_id, view) it was first requested for
+figure_sources = {}
+
+def figure_key(study, case_id, view):
+    """
+    Key of a case view in the figure cache: the content key of its image,
+    so studies showing the same image share one figure. Pyramid figures
+    are built from the study's own tiles and keyed by study.
+    """
+    if IMAGE_VIEWER == "pyramid":
+        key = f"{study.name}:{int(case_id)}{view}"
+    else:
+        key = study.images.key(case_id, view)
+    figure_sources.setdefault(key, (study, int(case_id), view))
+    return key
+
+def render_case_fig(key):
+    if IMAGE_VIEWER == "pyramid":
+        return create_pyramid_fig(*figure_sources[key])
+    if IMAGE_TRANSPORT == "url":
+        return create_image_fig(image_store.get(key), source=image_url(key))
+    return create_image_fig(image_store.get(key))
+
+figure_cache = FigureCache(
+    render_case_fig,
+    max_bytes=FIGURE_CACHE_MB * 1024 * 1024 if FIGURE_CACHE_MB > 0 else None,
+    render_threads=RENDER_THREADS,
+)
+
+def get_case_figs(study, case_id):
+    """Cached (CC, ML) figures of a case, as JSON-ready dicts."""
+    return (figure_cache.get(figure_key(study, case_id, "CC")),
+            figure_cache.get(figure_key(study, case_id, "ML")))
+
+def case_figs_and_labels(study, row):
+    """
+    (CC, ML) figures and label texts of a case. A case whose images are
+    missing is shown empty, with a note in its case-id label, so the reader
+    still answers (or reports) the case that is on screen.
+    """
+    labels = case_labels(row)
+    try:
+        return get_case_figs(study, row.case_id), labels
+    except FileNotFoundError as e:
+        logger.error("case image missing: study=%s case_id=%s %s", study.name, row.case_id, e)
+        labels[0] += " (images missing)"
+        return (EMPTY_FIG, EMPTY_FIG), labels
+
+def case_layout(fig):
+    """
+    The part of a figure's layout that differs between cases: the layout
+    image of the url transport with the axes sized to it, and the
+    zoom-state key used by the pyramid viewer.
+    """
+    layout = {"images": fig["layout"].get("images", [])}
+    if layout["images"]:
+        layout["xaxis"] = fig["layout"]["xaxis"]
+        layout["yaxis"] = fig["layout"]["yaxis"]
+    if "uirevision" in fig["layout"]:
+        layout["uirevision"] = fig["layout"]["uirevision"]
+    return layout
+
+def figure_patch(fig):
+    """
+    Partial update turning the figure on screen into `fig`: the rest of
+    the layout is the same for every case, so only the traces and the
+    case_layout() are sent.
+    """
+    patched = Patch()
+    patched["data"] = fig["data"]
+    for name, value in case_layout(fig).items():
+        patched["layout"][name] = value
+    return patched
+
+def case_payload(study, case_id):
+    """Everything the browser needs to show a case: label texts, figure traces and case layouts."""
+    row = get_case_row(study, case_id)
+    (fig1, fig2), labels = case_figs_and_labels(study, row)
+    return {
+        "case_id": str(case_id),
+        "labels": labels,
+        "data": [fig1["data"], fig2["data"]],
+        "layout": [case_layout(fig1), case_layout(fig2)],
+    }
+
+def warm_caches(background=True):
+    """
+    Decode the images of every case of every study before the first reader
+    logs in, then render their figures (in a background thread unless
+    `background=False`).
+    """
+    keys = []
+    for study in studies:
+        if IMAGE_VIEWER != "pyramid":
+            missing = study.images.warm(study.case_index.ids)
+            for msg in missing:
+                logger.warning("missing case image: study=%s %s", study.name, msg)
+        for case_id in study.case_index.ids:
+            for view in VIEWS:
+                try:
+                    keys.append(figure_key(study, case_id, view))
+                except FileNotFoundError:
+                    pass    # reported above
+    if IMAGE_VIEWER != "pyramid":
+        logger.info("image store warmed %s", image_store.stats())
+    figure_cache.warm(dict.fromkeys(keys), background=background)
+
 # -----------------------------
 # 3) Dash App setup
 # -----------------------------
-dbc_css = "https://cdn.jsdelivr.net/gh/AnnMarieW/dash-bootstrap-templates@V1.0.4/dbc.min.css"
+# theme and dbc css come from assets/vendor/ once downloaded (static_assets.py)
 app = dash.Dash(
     __name__,
-    external_stylesheets=[dbc.themes.CYBORG, dbc_css],
+    external_stylesheets=external_stylesheets(),
     meta_tags=[{"name": "viewport", "content": "width=device-width, initial-scale=1"}],
     suppress_callback_exceptions=True
 )
@@ -226,31 +507,50 @@ def thank_you_page():
 
 config = {"scrollZoom": True, "displayModeBar": True, "displaylogo": False}
 
+# placeholder for a case whose images are missing
+EMPTY_FIG = {
+    "data": [],
+    "layout": {
+        "paper_bgcolor": "black",
+        "plot_bgcolor": "black",
+        "margin": {"l": 0, "r": 0, "t": 0, "b": 0},
+        "xaxis": {"visible": False},
+        "yaxis": {"visible": False},
+    },
+}
+
 # -----------------------------
 # Main App UI Components (dynamic)
 # -----------------------------
-def build_main_layout(start_case_id):
-    # Look up the row for the starting case
-    row = get_case_row(start_case_id)
-    if row is None:
+def build_main_layout(study, start_case_id):
+    """
+    Skeleton of the reading screen. Labels and figures are left empty and
+    filled in by update_case_display, which fires as soon as the `case-id`
+    component mounts, so every case is loaded and sent exactly once.
+    """
+    if get_case_row(study, start_case_id) is None:
         # Fallback: if something's wrong, just show the first case
-        row = get_case_row(1)
+        start_case_id = study.case_index.first_id
 
-    # Load images for this case
-    img1, img2 = load_imgs(row["case_id"])
-    fig1 = create_image_fig(img1)
-    fig2 = create_image_fig(img2)
+    # the figure layout is shared by all cases; update_case_display only
+    # patches in the traces
+    try:
+        fig1, fig2 = get_case_figs(study, start_case_id)
+        skeleton1 = {"data": [], "layout": fig1["layout"]}
+        skeleton2 = {"data": [], "layout": fig2["layout"]}
+    except FileNotFoundError:
+        skeleton1 = skeleton2 = EMPTY_FIG
 
     # Graphs for CC / ML
     full_field_graph = dcc.Graph(
         id='graph-px',
-        figure=fig1,
+        figure=skeleton1,
         config=config,
         style={"height": "100vh"}
     )
     ROI_graph = dcc.Graph(
         id="roi-px",
-        figure=fig2,
+        figure=skeleton2,
         config=config,
         style={"height": "100vh"}
     )
@@ -289,28 +589,36 @@ def build_main_layout(start_case_id):
     info_card = dbc.Card(
         [
             dbc.CardBody([
+                # filled in by assets/study_download.js while the study downloads
+                dbc.Progress(
+                    id="predownload-progress",
+                    value=0,
+                    label="",
+                    style={"height": "24px", "marginBottom": "10px",
+                           "display": "flex" if PREDOWNLOAD else "none"}
+                ),
                 html.P(
-                    f"Case ID: {row['id']}",
+                    "",
                     id="case-id-label",
                     style={'font-size': '30px', 'color': 'white'}
                 ),
                 html.P(
-                    f"Patient age: {row['patient_age']}",
+                    "",
                     id="patient-age-label",
                     style={'font-size': '30px', 'color': 'white'}
                 ),
                 html.P(
-                    f"Patient race: {pretty_race(row['patient_race'])}",
+                    "",
                     id="patient-race-label",
                     style={'font-size': '30px', 'color': 'white'}
                 ),
                 html.P(
-                    f"Patient ethnicity: {pretty_ethnicity(row['patient_ethnicity'])}",
+                    "",
                     id="patient-ethnicity-label",
                     style={'font-size': '30px', 'color': 'white'}
                 ),
                 html.P(
-                    f"Calcification longest span (mm): {row['calcification_span']}",
+                    "",
                     id="calc-span-label",
                     style={'font-size': '30px', 'color': 'white'}
                 ),
@@ -404,6 +712,17 @@ def build_main_layout(start_case_id):
                     ),
                     hidden_case_id,
                     dcc.Store(id="previous-case-id", data=str(start_case_id)),
+                    # set by the clientside answer check once all questions are answered
+                    dcc.Store(id="submit-request"),
+                    # payload of the next case, fetched while the reader works on this one
+                    dcc.Store(id="prefetch-store"),
+                    dcc.Store(id="prefetch-case-id"),
+                    # image URLs of the prefetched case the browser has started loading
+                    dcc.Store(id="preloaded-images"),
+                    # PREDOWNLOAD: every remaining case, and which of them the browser holds
+                    dcc.Store(id="predownload-start", data=str(start_case_id) if PREDOWNLOAD else None),
+                    dcc.Store(id="study-payloads"),
+                    dcc.Store(id="predownload-status"),
                 ],
                 fluid=True,
             )
@@ -416,6 +735,7 @@ def build_main_layout(start_case_id):
 app.layout = html.Div([
     dcc.Location(id="url", refresh=False),
     dcc.Store(id="session", storage_type="session"),
+    # name of the study the reader has just finished
     dcc.Store(id="finished", storage_type="session", data=False),
     html.Div(id="page-content")
 ])
@@ -423,37 +743,64 @@ app.layout = html.Div([
 # -----------------------------
 # Login Logic
 # -----------------------------
+# loaded once, re-read only when valid_ids.csv changes on disk
+valid_ids = ValidIdSet(VALID_IDS_FILE)
+
+def is_local_request():
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+@app.server.route("/admin/valid-ids", methods=["GET", "POST"])
+def valid_ids_admin():
+    """GET: login counters. POST: force a reload of valid_ids.csv. Local requests only."""
+    if not is_local_request():
+        return jsonify(error="forbidden"), 403
+    if request.method == "POST":
+        valid_ids.reload()
+    return jsonify(valid_ids.stats())
+
+@app.server.route(f"{IMAGE_ROUTE}/<key>.png")
+@metrics.timed("case_image")
+def case_image(key):
+    """
+    One case image as PNG (url transport), by content key, so an image
+    shared by several studies has one URL. The ETag is a hash of the bytes,
+    so revisits are answered with 304; figure URLs carry that hash (?v=),
+    never change, and may be cached by browsers and proxies for IMAGE_MAX_AGE.
+    """
+    # only images of the studies' cases, never a path hashed on request
+    if key not in image_store:
+        return jsonify(error="not found"), 404
+    try:
+        data, etag = encoded_images.get(key)
+    except FileNotFoundError as e:
+        logger.error("case image missing: %s", e)
+        return jsonify(error="not found"), 404
+    response = Response(data, mimetype=encoded_images.mime_type)
+    response.set_etag(etag)
+    response.cache_control.public = True
+    if request.args.get("v") == etag:
+        response.cache_control.max_age = IMAGE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 @app.callback(
     Output("session", "data"),
     Output("login-message", "children"),
     Input("login-button", "n_clicks"),
     State("user-id-input", "value"),
+    State("url", "pathname"),
     prevent_initial_call=True
 )
-def handle_login(n_clicks, user_input):
+@metrics.timed("handle_login")
+def handle_login(n_clicks, user_input, pathname):
     if not user_input:
         return dash.no_update, ""
-    with open("valid_ids.csv") as f:
-        valid_ids = set(line.strip() for line in f)
     user_id = user_input.strip()
-    if user_id in valid_ids:
-        # make sure output directory exists
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
-        # filename = f"output/{user_id}_testing.csv"
-        filename = os.path.join(OUTPUT_DIR, f"{user_id}_testing.csv")
-        # Only create file with header if it doesn't already exist
-        if not os.path.exists(filename):
-            with open(filename, "w", newline="") as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow([
-                    "userID",
-                    "timestamp",
-                    "case_id",
-                    "patient_id",
-                    "pathology",
-                    "birads",
-                    "confidence",
-                ])
+    if valid_ids.check(user_id):
+        # make sure the user has a results file / row before the first submit
+        studies.for_path(pathname).storage.register_user(user_id)
         return user_id, ""
     else:
         return dash.no_update, "Invalid ID."
@@ -464,49 +811,78 @@ def handle_login(n_clicks, user_input):
 @app.callback(
     Output("page-content", "children"),
     Input("session", "data"),
-    Input("finished", "data")
+    Input("finished", "data"),
+    Input("url", "pathname")
 )
-def display_page(user_id, finished):
+@metrics.timed("display_page")
+def display_page(user_id, finished, pathname):
     if not user_id:
         return login_page()
-    if finished:
+    study = studies.for_path(pathname)
+    if finished == study.name:
         return thank_you_page()
 
-    start_case_id = get_start_case_for_user(user_id)
-    print("display_page for user:", user_id, "start_case_id:", start_case_id)
+    start_case_id = get_start_case_for_user(study, user_id)
+    logger.info("display_page study=%s user=%s start_case_id=%s", study.name, user_id, start_case_id)
 
     if start_case_id is None:
         return thank_you_page()
 
-    return build_main_layout(start_case_id)
+    return build_main_layout(study, start_case_id)
 
 # -----------------------------
-# Submit handler (no feedback UI, but with end screen)
+# Submit handler (with end screen, and the correct answers in studies with feedback)
 # -----------------------------
+def answer_feedback(row, user_pathology, user_birads):
+    """Right / wrong alert for the case just submitted, naming the correct answers."""
+    correct_pathology = str(row.correct_pathology).strip()
+    correct_birads = f"BI-RADS {row.correct_BIRADS}"
+    pathology_ok = user_pathology.lower() == correct_pathology.lower()
+    birads_ok = user_birads == correct_birads
+    return dbc.Alert(
+        [
+            html.B(f"Case {row.id}"),
+            html.Br(),
+            "Pathology: well done!" if pathology_ok
+            else f"Pathology: incorrect, the correct pathology is: {correct_pathology}",
+            html.Br(),
+            "BI-RADS: well done!" if birads_ok
+            else f"BI-RADS: incorrect, the correct assessment is: {correct_birads}",
+        ],
+        color="success" if pathology_ok and birads_ok else "danger",
+        dismissable=True,
+        style={"marginTop": "10px"}
+    )
+
 @app.callback(
     [
         Output("case-id", "children"),
         Output("submit-message", "children"),
         Output("finished", "data"),
     ],
-    Input("submit-button", "n_clicks"),
+    Input("submit-request", "data"),
     State("session", "data"),
     State("input-pathology", "value"),
     State("input-birads", "value"),
     State("input-confidence", "value"),
     State("case-id", "children"),
+    State("url", "pathname"),
     prevent_initial_call=True
 )
+@metrics.timed("handle_submit")
 def handle_submit(n_clicks, session_user_id,
                   user_pathology, user_birads, user_confidence,
-                  case_id):
+                  case_id, pathname):
 
     if not n_clicks:
-        raise dash.exceptions.PreventUpdate
+        # called when the main layout is inserted: pass the start case on,
+        # so update_case_display fills the skeleton (a PreventUpdate here
+        # would cancel it too)
+        return case_id, dash.no_update, dash.no_update
 
     new_finished = dash.no_update
 
-    # Validation
+    # Validation (normally already done in the browser by check_answers)
     if (user_pathology is None) and (user_birads is None) and (user_confidence is None):
         msg = dbc.Alert(
             "Please answer all questions (BI-RADS, pathology, and confidence) before submitting.",
@@ -536,7 +912,8 @@ def handle_submit(n_clicks, session_user_id,
         )
         return case_id, msg, new_finished
 
-    row = get_case_row(case_id)
+    study = studies.for_path(pathname)
+    row = get_case_row(study, case_id)
     if row is None:
         msg = dbc.Alert(
             "No data found for this case.",
@@ -546,37 +923,31 @@ def handle_submit(n_clicks, session_user_id,
         return case_id, msg, new_finished
 
     timestamp = datetime.now().isoformat()
-    patient_id = row["id"]
+    patient_id = row.id
     if not session_user_id:
         session_user_id = "unknown"
 
-    # filename = f"{session_user_id}_testing.csv"
-    filename = f"output/{session_user_id}_testing.csv"
-    with open(filename, "a", newline="") as csvfile:
-        writer = csv.writer(csvfile)
-        confidence_str = f"{user_confidence}%" if user_confidence is not None else ""
-        writer.writerow([
-            session_user_id,
-            timestamp,
-            case_id,
-            patient_id,
-            user_pathology,
-            user_birads,
-            confidence_str,
-        ])
-
-    current_idx = cases_df.index[cases_df["case_id"] == int(case_id)]
-    is_last_case = (
-        len(current_idx) > 0 and current_idx[0] == len(cases_df) - 1
-    )
+    confidence_str = f"{user_confidence}%" if user_confidence is not None else ""
+    # queued for the background writer, journaled so it survives a crash
+    study.response_writer.submit([
+        session_user_id,
+        timestamp,
+        case_id,
+        patient_id,
+        user_pathology,
+        user_birads,
+        confidence_str,
+    ])
+    study.progress.record(session_user_id, case_id)
 
-    if is_last_case:
+    if study.case_index.is_last(case_id):
         new_case_id = case_id
-        new_finished = True
+        new_finished = study.name
     else:
-        new_case_id = get_next_case_id(case_id)
+        new_case_id = get_next_case_id(study, case_id)
 
-    return new_case_id, None, new_finished
+    feedback = answer_feedback(row, user_pathology, user_birads) if study.feedback else None
+    return new_case_id, feedback, new_finished
 
 # -----------------------------
 # Update displayed text/images whenever case-id changes
@@ -600,12 +971,18 @@ def handle_submit(n_clicks, session_user_id,
         State("input-pathology", "value"),
         State("input-birads", "value"),
         State("input-confidence", "value"),
-        State("previous-case-id", "data")
+        State("previous-case-id", "data"),
+        State("prefetch-case-id", "data"),
+        State("predownload-status", "data"),
+        State("url", "pathname")
     ]
 )
+@metrics.timed("update_case_display")
 def update_case_display(case_id, current_pathology, current_birads,
-                        current_confidence, previous_case_id):
-    row = get_case_row(case_id)
+                        current_confidence, previous_case_id, prefetched_case_id,
+                        predownloaded_case_ids, pathname):
+    study = studies.for_path(pathname)
+    row = get_case_row(study, case_id)
     if row is None:
         return (
             "Case ID: ???",
@@ -615,21 +992,21 @@ def update_case_display(case_id, current_pathology, current_birads,
             "Calcification longest span: ???",
             current_pathology,
             current_birads,
-            {},
-            {},
+            figure_patch(EMPTY_FIG),
+            figure_patch(EMPTY_FIG),
             current_confidence,
             previous_case_id
         )
 
-    case_id_text = f"Case ID: {row['id']}"
-    age_text = f"Patient age: {row['patient_age']}"
-    race_text = f"Patient race: {pretty_race(row['patient_race'])}"
-    ethnicity_text = f"Patient ethnicity: {pretty_ethnicity(row['patient_ethnicity'])}"
-    span_text = f"Calcification longest span (mm): {row['calcification_span']}"
+    if case_id != previous_case_id and (case_id == prefetched_case_id
+                                        or case_id in (predownloaded_case_ids or [])):
+        # already swapped in by the browser from the prefetch store or the
+        # downloaded study
+        raise dash.exceptions.PreventUpdate
 
-    img1, img2 = load_imgs(row["case_id"])
-    fig1 = create_image_fig(img1)
-    fig2 = create_image_fig(img2)
+    (fig1, fig2), labels = case_figs_and_labels(study, row)
+    case_id_text, age_text, race_text, ethnicity_text, span_text = labels
+    fig1, fig2 = figure_patch(fig1), figure_patch(fig2)
 
     if case_id != previous_case_id:
         # New case: reset answers
@@ -662,5 +1039,333 @@ def update_case_display(case_id, current_pathology, current_birads,
             previous_case_id
         )
 
+# -----------------------------
+# Next-case prefetching
+# -----------------------------
+@app.callback(
+    Output("prefetch-store", "data"),
+    Output("prefetch-case-id", "data"),
+    Input("previous-case-id", "data"),
+    State("url", "pathname")
+)
+@metrics.timed("prefetch_next_case")
+def prefetch_next_case(shown_case_id, pathname):
+    """
+    Once a case is on screen, send the next case to the browser and start
+    rendering the one after it on the server, so Submit & Next never waits
+    on a render.
+    """
+    study = studies.for_path(pathname)
+    next_case_id = get_following_case_id(study, shown_case_id) if shown_case_id else None
+    if next_case_id is None:
+        return None, None
+    after_next = get_following_case_id(study, next_case_id)
+    if after_next is not None:
+        try:
+            figure_cache.prefetch([figure_key(study, after_next, view) for view in VIEWS])
+        except FileNotFoundError:
+            pass    # shown as an empty case once reached
+    return case_payload(study, next_case_id), next_case_id
+
+@app.callback(
+    Output("study-payloads", "data"),
+    Input("predownload-start", "data"),
+    State("url", "pathname")
+)
+@metrics.timed("send_study_payloads")
+def send_study_payloads(start_case_id, pathname):
+    """
+    PREDOWNLOAD: the payloads of every case from `start_case_id` to the
+    end, in reading order. They only hold image URLs, the browser then
+    downloads the images itself (assets/study_download.js).
+    """
+    if not start_case_id:
+        raise dash.exceptions.PreventUpdate
+    study = studies.for_path(pathname)
+    order, cases = [], {}
+    case_id = start_case_id
+    while case_id is not None:
+        # a case with missing images has none to download and is shown empty
+        cases[str(case_id)] = case_payload(study, case_id)
+        order.append(str(case_id))
+        case_id = get_following_case_id(study, case_id)
+    return {"order": order, "cases": cases}
+
+# swap in the prefetched case without a server round trip
+app.clientside_callback(
+    ClientsideFunction(namespace="prefetch", function_name="apply_prefetched_case"),
+    [
+        Output("case-id-label", "children", allow_duplicate=True),
+        Output("patient-age-label", "children", allow_duplicate=True),
+        Output("patient-race-label", "children", allow_duplicate=True),
+        Output("patient-ethnicity-label", "children", allow_duplicate=True),
+        Output("calc-span-label", "children", allow_duplicate=True),
+        Output("input-pathology", "value", allow_duplicate=True),
+        Output("input-birads", "value", allow_duplicate=True),
+        Output("graph-px", "figure", allow_duplicate=True),
+        Output("roi-px", "figure", allow_duplicate=True),
+        Output("input-confidence", "value", allow_duplicate=True),
+        Output("previous-case-id", "data", allow_duplicate=True)
+    ],
+    Input("case-id", "children"),
+    State("prefetch-store", "data"),
+    State("previous-case-id", "data"),
+    State("graph-px", "figure"),
+    State("roi-px", "figure"),
+    State("study-payloads", "data"),
+    State("predownload-status", "data"),
+    prevent_initial_call=True
+)
+
+# PREDOWNLOAD: download the images of all remaining cases into browser storage
+app.clientside_callback(
+    ClientsideFunction(namespace="predownload", function_name="download_study"),
+    Output("predownload-status", "data"),
+    Input("study-payloads", "data"),
+    prevent_initial_call=True
+)
+
+# -----------------------------
+# Answer completeness check (in the browser)
+# -----------------------------
+# url transport: load the next case's images into the HTTP cache early
+app.clientside_callback(
+    ClientsideFunction(namespace="prefetch", function_name="preload_images"),
+    Output("preloaded-images", "data"),
+    Input("prefetch-store", "data"),
+    prevent_initial_call=True
+)
+app.clientside_callback(
+    ClientsideFunction(namespace="answers", function_name="check_answers"),
+    Output("submit-message", "children", allow_duplicate=True),
+    Output("submit-request", "data"),
+    Input("submit-button", "n_clicks"),
+    State("input-pathology", "value"),
+    State("input-birads", "value"),
+    State("input-confidence", "value"),
+    prevent_initial_call=True
+)
+
+# -----------------------------
+# Metrics
+# -----------------------------
+def callback_name():
+    """Name of the callback called by a /_dash-update-component request."""
+    body = request.get_json(silent=True)
+    output = body.get("output") if isinstance(body, dict) else None
+    if not isinstance(output, str):
+        return "unknown"
+    # anything else a client posts would become a label value of its own
+    callback = app.callback_map.get(output, {}).get("callback")
+    return getattr(callback, "__name__", "unknown")
+
+admission = (AdmissionController(MAX_INFLIGHT_CALLBACKS, MAX_INFLIGHT_RENDERS, SUBMIT_QUEUE_SECONDS)
+             if MAX_INFLIGHT_CALLBACKS > 0 else None)
+
+@app.server.before_request
+def admit_callback():
+    """Turn expensive callbacks away with a retryable 503 while the process is at capacity."""
+    if admission is None or not request.path.endswith("/_dash-update-component"):
+        return None
+    kind = CALLBACK_KINDS.get(callback_name())
+    if kind is None:
+        return None
+    if not admission.acquire(kind):
+        logger.warning("admission rejected kind=%s stats=%s", kind, admission.stats()["inflight"])
+        response = jsonify(error="server busy, retry later")
+        response.status_code = 503
+        response.headers["Retry-After"] = str(RETRY_AFTER_SECONDS)
+        # assets/retry.js resends submissions until they get through
+        response.headers["X-Callback-Kind"] = kind
+        return response
+    g.admitted_kind = kind
+    return None
+
+@app.server.teardown_request
+def release_callback(exc):
+    kind = g.pop("admitted_kind", None)
+    if kind is not None:
+        admission.release(kind)
+
+@app.server.after_request
+def record_callback_payload(response):
+    if request.path.endswith("/_dash-update-component"):
+        metrics.observe_payload(callback_name(), response.calculate_content_length() or 0)
+    return response
+
+def cache_samples():
+    samples = []
+    figures = figure_cache.stats()
+    caches = [
+        ({"cache": "images"}, image_store.stats()),
+        ({"cache": "encoded_images"}, encoded_images.stats()),
+        ({"cache": "figures"}, figures),
+    ]
+    caches += [({"cache": "pyramid_tiles", "study": study.name}, study.pyramid.stats()) for study in studies]
+    for labels, stats in caches:
+        samples += [
+            ("mammo_cache_hits_total", "counter", "Cache hits.", labels, stats["hits"]),
+            ("mammo_cache_misses_total", "counter", "Cache misses.", labels, stats["misses"]),
+            ("mammo_cache_evictions_total", "counter", "Cache evictions.", labels, stats["evictions"]),
+            ("mammo_cache_bytes", "gauge", "Bytes held by the cache.", labels, stats["bytes"]),
+        ]
+    samples += [
+        ("mammo_figure_renders_total", "counter", "Figures rendered on cache misses.", {}, figures["renders"]),
+        ("mammo_figure_renders_coalesced_total", "counter",
+         "Cache misses that waited for a render already in progress instead of rendering.", {},
+         figures["renders_coalesced"]),
+    ]
+    if admission is not None:
+        admission_stats = admission.stats()
+        for kind in ("submit", "render"):
+            labels = {"kind": kind}
+            samples += [
+                ("mammo_callbacks_inflight", "gauge", "Admitted callbacks running.", labels,
+                 admission_stats["inflight"][kind]),
+                ("mammo_callbacks_admitted_total", "counter", "Callbacks admitted.", labels,
+                 admission_stats["admitted"][kind]),
+                ("mammo_callbacks_rejected_total", "counter", "Callbacks turned away (503).", labels,
+                 admission_stats["rejected"][kind]),
+            ]
+    login = valid_ids.stats()
+    samples += [
+        ("mammo_login_attempts_total", "counter", "Login attempts.", {}, login["login_attempts"]),
+        ("mammo_login_rejections_total", "counter", "Rejected logins.", {}, login["login_rejections"]),
+    ]
+    for study in studies:
+        writer = study.response_writer.stats()
+        labels = {"study": study.name}
+        samples += [
+            ("mammo_responses_queued", "gauge", "Submissions waiting for the writer.", labels, writer["queued"]),
+            ("mammo_responses_written_total", "counter", "Submissions written to storage.", labels,
+             writer["rows_written"]),
+            ("mammo_response_write_errors_total", "counter", "Failed storage writes (retried).", labels,
+             writer["errors"]),
+        ]
+    return samples
+
+metrics.add_collector(cache_samples)
+
+@app.server.route("/metrics")
+def metrics_endpoint():
+    """Prometheus text format. Local requests only."""
+    if not is_local_request():
+        return Response("forbidden\n", status=403, mimetype="text/plain")
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# -----------------------------
+# Client-side render telemetry (sent by assets/telemetry.js)
+# -----------------------------
+def telemetry_number(value):
+    return int(value) if isinstance(value, (int, float)) and 0 <= value < 3600_000 else ""
+
+@app.server.route("/telemetry", methods=["POST"])
+def record_telemetry():
+    if not CLIENT_TELEMETRY:
+        return "", 204
+    entries = request.get_json(force=True, silent=True)
+    if not isinstance(entries, list):
+        return jsonify(error="expected a list"), 400
+
+    received = datetime.now().isoformat()
+    rows_by_file = {}
+    for entry in entries[:TELEMETRY_MAX_BATCH]:
+        if not isinstance(entry, dict):
+            continue
+        user_id = entry.get("user_id")
+        # the user id becomes a file name: only accept known readers
+        if not isinstance(user_id, str) or user_id not in valid_ids:
+            continue
+        study = studies.for_path(entry.get("path") if isinstance(entry.get("path"), str) else None)
+        path = os.path.join(study.output_dir, f"{user_id}_telemetry.csv")
+        rows_by_file.setdefault(path, []).append([
+            user_id,
+            received,
+            str(entry.get("client_time", ""))[:40],
+            "login" if entry.get("kind") == "login" else "submit",
+            str(entry.get("from_case_id") or "")[:20],
+            str(entry.get("case_id") or "")[:20],
+            telemetry_number(entry.get("click_to_case_ms")),
+            telemetry_number(entry.get("click_to_render_ms")),
+        ])
+    for path, rows in rows_by_file.items():
+        append_csv_rows(path, rows, header=TELEMETRY_HEADER)
+    return "", 204
+
+# -----------------------------
+# Pyramid viewer: high-resolution tiles for the zoomed region
+# -----------------------------
+def visible_range(relayout_data, axis):
+    if f"{axis}.range[0]" in relayout_data:
+        return relayout_data[f"{axis}.range[0]"], relayout_data[f"{axis}.range[1]"]
+    if f"{axis}.range" in relayout_data:
+        return tuple(relayout_data[f"{axis}.range"])
+    return None
+
+def zoom_detail_patch(relayout_data, pathname, case_id, view):
+    if not relayout_data:
+        raise dash.exceptions.PreventUpdate
+
+    study = studies.for_path(pathname)
+    try:
+        study.pyramid.meta(case_id, view)
+    except FileNotFoundError:
+        # the case is shown empty (case_figs_and_labels): no detail trace to patch
+        raise dash.exceptions.PreventUpdate
+
+    patched = Patch()
+    if relayout_data.get("xaxis.autorange") or relayout_data.get("autosize"):
+        # zoom reset: the overview is enough
+        patched["data"][1]["visible"] = False
+        return patched
+
+    x_range = visible_range(relayout_data, "xaxis")
+    y_range = visible_range(relayout_data, "yaxis")
+    if x_range is None or y_range is None:
+        raise dash.exceptions.PreventUpdate
+
+    region = study.pyramid.region(case_id, view, x_range, y_range, PYRAMID_DETAIL_PX)
+    if region is None:
+        patched["data"][1]["visible"] = False
+        return patched
+
+    crop, scale, x_origin, y_origin = region
+    patched["data"][1] = {
+        "type": "image",
+        "source": image_data_uri(crop, pyramid_transport(), IMAGE_QUALITY),
+        "x0": x_origin + (scale - 1) / 2,
+        "y0": y_origin + (scale - 1) / 2,
+        "dx": scale,
+        "dy": scale,
+        "hoverinfo": "skip",
+        "visible": True,
+    }
+    return patched
+
+if IMAGE_VIEWER == "pyramid":
+    @app.callback(
+        Output("graph-px", "figure", allow_duplicate=True),
+        Input("graph-px", "relayoutData"),
+        State("case-id", "children"),
+        State("url", "pathname"),
+        prevent_initial_call=True
+    )
+    def zoom_cc_detail(relayout_data, case_id, pathname):
+        return zoom_detail_patch(relayout_data, pathname, case_id, "CC")
+
+    @app.callback(
+        Output("roi-px", "figure", allow_duplicate=True),
+        Input("roi-px", "relayoutData"),
+        State("case-id", "children"),
+        State("url", "pathname"),
+        prevent_initial_call=True
+    )
+    def zoom_ml_detail(relayout_data, case_id, pathname):
+        return zoom_detail_patch(relayout_data, pathname, case_id, "ML")
+
 if __name__ == '__main__':
-    app.run(debug=True, host="127.0.0.1", port=8053)
\ No newline at end of file
+    # with the debug reloader this process only watches the source files
+    # and the server runs in a child process it starts: warm only there
+    if not DEBUG or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        warm_caches()
+    app.run(debug=DEBUG, host=HOST, port=PORT)
\ No newline at end of file
@@ -0,0 +1,69 @@
+import os
+import threading
+
+
+class ValidIdSet:
+    """
+    The login IDs from valid_ids.csv, held in memory.
+
+    The file is re-read only when its modification time (or size) changes,
+    or when `reload()` is called. IDs are stripped of surrounding
+    whitespace and blank lines are ignored, so `yjo ` in the file matches a
+    reader typing `yjo`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._ids = frozenset()
+        self._stamp = None
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self.attempts = 0
+        self.rejections = 0
+
+    def _file_stamp(self):
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def reload(self):
+        with self._lock:
+            stamp = self._file_stamp()
+            with open(self.path) as f:
+                ids = frozenset(line.strip() for line in f if line.strip())
+            self._ids, self._stamp = ids, stamp
+            self.reloads += 1
+            return len(ids)
+
+    def _refresh(self):
+        try:
+            stamp = self._file_stamp()
+        except FileNotFoundError:
+            # keep the last good set if the file is being replaced
+            return
+        if stamp != self._stamp:
+            self.reload()
+
+    def __contains__(self, user_id):
+        self._refresh()
+        return user_id in self._ids
+
+    def check(self, user_id):
+        """Membership test that also counts the login attempt / rejection."""
+        ok = user_id in self
+        with self._lock:
+            self.attempts += 1
+            if not ok:
+                self.rejections += 1
+        return ok
+
+    def __len__(self):
+        self._refresh()
+        return len(self._ids)
+
+    def stats(self):
+        return {
+            "ids": len(self._ids),
+            "reloads": self.reloads,
+            "login_attempts": self.attempts,
+            "login_rejections": self.rejections,
+        }
@@ -0,0 +1,24 @@
+"""
+Production entry point, e.g.
+
+    gunicorn -c gunicorn.conf.py wsgi:server
+
+Everything shared by the workers (decoded images, rendered figures, case
+index, valid IDs) is loaded here, once, in the master process. With
+`preload_app = True` the workers are forked afterwards and share those
+pages with the master copy-on-write instead of each building their own.
+"""
+import gc
+
+from testing_app import app, warm_caches
+
+# render synchronously: a background warm-up thread would not survive the fork
+warm_caches(background=False)
+
+# keep the garbage collector from touching (and so un-sharing) the
+# preloaded objects in every worker
+gc.collect()
+gc.freeze()
+
+server = app.server
+application = server